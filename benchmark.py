@@ -0,0 +1,300 @@
+"""Benchmark klaim makan siang: replay kurva kedatangan lewat banyak sesi.
+
+Setiap kedatangan = satu sesi Streamlit headless (streamlit.testing AppTest)
+yang membuka halaman, mengisi NRP + nama lalu menekan tombol klaim, semua
+terhadap database sementara (LUNCH_DB). AppTest tidak aman dipakai paralel
+dalam satu proses, jadi sesi dibagi ke beberapa proses worker (seperti
+beberapa proses server) yang menulis ke database yang sama. Hasil disimpan
+sebagai JSON agar bisa dibandingkan antar perubahan:
+
+    python benchmark.py --employees 200 --window 600 --speedup 20 -o before.json
+    python benchmark.py ... -o after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+APP_PATH = Path(__file__).with_name("lunch.py")
+CLAIM_BUTTON = "Cek / Klaim Makan Siang"
+PROBE_INTERVAL = 0.05  # detik antar percobaan lock oleh probe writer
+
+
+# =========================
+# KURVA KEDATANGAN
+# =========================
+def arrival_times(curve, count, window, seed=0):
+    """Detik kedatangan (urut) untuk `count` orang dalam `window` detik.
+
+    uniform : merata sepanjang window
+    poisson : proses Poisson dengan rata-rata yang sama
+    peak    : sebagian besar datang di awal jam istirahat (segitiga menurun)
+    """
+    rng = random.Random(seed)
+    if curve == "uniform":
+        times = [window * i / count for i in range(count)]
+    elif curve == "poisson":
+        rate = count / window
+        t, times = 0.0, []
+        for _ in range(count):
+            t += rng.expovariate(rate)
+            times.append(min(t, window))
+    elif curve == "peak":
+        times = [rng.triangular(0, window, 0) for _ in range(count)]
+    else:
+        raise ValueError(f"Kurva tidak dikenal: {curve}")
+    return sorted(times)
+
+
+# =========================
+# PROBE LOCK SQLITE
+# =========================
+class LockProbe:
+    """Writer terpisah yang terus mencoba BEGIN IMMEDIATE dan mencatat lama menunggu lock."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.waits = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lock-probe", daemon=True)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                self.waits.append(time.perf_counter() - started)
+                conn.execute("ROLLBACK")
+                self._stop.wait(PROBE_INTERVAL)
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# =========================
+# SESI & STATISTIK
+# =========================
+def percentiles(samples):
+    """p50/p95/p99/max dalam milidetik."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+def timed_run(at):
+    started = time.perf_counter()
+    at.run()
+    return time.perf_counter() - started
+
+def run_session(nrp, name, timeout):
+    """Satu karyawan: buka halaman, rerun biasa, isi form, klaim. Kembalikan durasi tiap langkah."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    first_load = timed_run(at)
+    rerun = timed_run(at)
+
+    inputs = [t for t in at.text_input if t.label in ("NRP:", "Nama Lengkap:")]
+    inputs[0].input(nrp)
+    inputs[1].input(name)
+    fill = timed_run(at)
+
+    button = next(b for b in at.button if b.label == CLAIM_BUTTON)
+    button.click()
+    claim = timed_run(at)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    success = any("full-screen-modal-overlay" in m.value for m in at.markdown)
+    return {"first_load": first_load, "rerun": rerun, "fill": fill, "claim": claim, "success": success}
+
+def arrive(nrp, name, at_wall, timeout):
+    """Task worker: tunggu jadwal kedatangan (jam dinding) lalu jalankan satu sesi."""
+    delay = at_wall - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    lateness = max(time.time() - at_wall, 0.0)
+    try:
+        result = run_session(nrp, name, timeout)
+    except Exception as e:  # dicatat, benchmark jalan terus
+        return {"error": repr(e), "pid": os.getpid()}
+    result.update(lateness=lateness, pid=os.getpid())
+    return result
+
+def _init_worker(db_path):
+    os.environ["LUNCH_DB"] = db_path
+
+def seed_employees(db_path, count):
+    """Isi employees (skema dibuat oleh run pertama aplikasi)."""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT OR IGNORE INTO employees (nrp, name) VALUES (?, ?)",
+        [(f"{100000 + i}", f"Karyawan {i}") for i in range(count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+# =========================
+# BENCHMARK
+# =========================
+def run_benchmark(args):
+    workdir = Path(tempfile.mkdtemp(prefix="lunch-bench-"))
+    db_path = workdir / "lunch.db"
+
+    # AppTest mengganti sys.modules["__main__"] di worker dengan lunch.py, jadi
+    # fungsi task harus dirujuk lewat modul `benchmark`, bukan __main__.
+    from benchmark import _init_worker, arrive
+
+    # spawn: setiap worker = proses bersih dengan cache_resource & thread sendiri
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=context,
+                             initializer=_init_worker, initargs=(str(db_path),)) as pool:
+        # Sesi pertama membuat skema (migrasi) sebelum data karyawan diisi
+        warmup = pool.submit(arrive, "000000", "Warmup", 0, args.timeout).result()
+        if "error" in warmup:
+            raise RuntimeError(warmup["error"])
+        seed_employees(db_path, args.employees)
+
+        schedule = arrival_times(args.curve, args.employees, args.window / args.speedup, args.seed)
+        with LockProbe(str(db_path)) as probe:
+            base = time.time() + 1.0  # beri waktu semua task masuk antrian
+            futures = [
+                pool.submit(arrive, f"{100000 + i}", f"Karyawan {i}", base + at_time, args.timeout)
+                for i, at_time in enumerate(schedule)
+            ]
+            outcomes = [f.result() for f in futures]
+            elapsed = time.time() - base
+
+    results = [r for r in outcomes if "error" not in r]
+    errors = [r["error"] for r in outcomes if "error" in r]
+    # Sesi pertama tiap worker termasuk cold start (import, compile, cache_resource)
+    seen, warm = {warmup["pid"]}, []
+    for r in results:
+        if r["pid"] not in seen:
+            seen.add(r["pid"])
+        else:
+            warm.append(r)
+
+    claimed = sum(r["success"] for r in results)
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT COUNT(*) FROM claims WHERE nrp != '000000'").fetchone()[0]
+    conn.close()
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": vars(args),
+        "environment": environment(),
+        "cold_start_ms": warmup["first_load"] * 1000,
+        "elapsed_s": elapsed,
+        "sessions": len(results),
+        "errors": errors,
+        "claims_ok": claimed,
+        "claims_in_db": rows,
+        "claims_per_sec": claimed / elapsed if elapsed else None,
+        "claim_latency": percentiles([r["claim"] for r in results]),
+        "rerun_cost": percentiles([r["rerun"] for r in warm]),
+        "first_load": percentiles([r["first_load"] for r in warm]),
+        "form_fill": percentiles([r["fill"] for r in warm]),
+        "arrival_lateness": percentiles([r["lateness"] for r in results]),
+        "lock_wait": percentiles(probe.waits),
+        "workdir": str(workdir) if args.keep else None,
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_PATH.parent,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import streamlit
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+    }
+
+COMPARE_KEYS = (
+    ("claim_latency", "p50_ms"), ("claim_latency", "p95_ms"), ("claim_latency", "p99_ms"),
+    ("rerun_cost", "p50_ms"), ("rerun_cost", "p95_ms"),
+    ("lock_wait", "p95_ms"), ("lock_wait", "max_ms"),
+    ("claims_per_sec", None),
+)
+
+def compare(current, baseline):
+    """Cetak perbandingan metrik utama terhadap hasil sebelumnya."""
+    print(f"{'metrik':<28}{'sebelum':>12}{'sesudah':>12}{'selisih':>10}")
+    for section, key in COMPARE_KEYS:
+        before = baseline.get(section) if key is None else (baseline.get(section) or {}).get(key)
+        after = current.get(section) if key is None else (current.get(section) or {}).get(key)
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+        label = section if key is None else f"{section}.{key}"
+        print(f"{label:<28}{before:>12.2f}{after:>12.2f}{change:>10}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=200, help="jumlah karyawan yang klaim")
+    parser.add_argument("--window", type=float, default=600, help="lama jam klaim dalam detik (waktu nyata)")
+    parser.add_argument("--speedup", type=float, default=20, help="faktor percepatan replay kurva")
+    parser.add_argument("--curve", choices=("uniform", "poisson", "peak"), default="peak")
+    parser.add_argument("--workers", type=int, default=4, help="proses worker (sesi berjalan bersamaan)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60, help="timeout satu run script (detik)")
+    parser.add_argument("--keep", action="store_true", help="jangan hapus database sementara")
+    parser.add_argument("-o", "--output", help="tulis hasil JSON ke file ini")
+    parser.add_argument("--compare", help="file JSON hasil sebelumnya untuk dibandingkan")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run_benchmark(args)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text()))
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
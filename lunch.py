@@ -1,53 +1,42 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
+import streamlit.components.v1 as components
 from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
-import plotly.express as px
 import time
 import base64
-
-# =========================
-# DATABASE SETUP & CACHING
-# =========================
-DB_NAME = "lunch.db"
-
-# Menggunakan st.cache_resource untuk koneksi database
-@st.cache_resource
-def get_db_connection():
-    """Mengembalikan objek koneksi database yang di-cache."""
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    return conn
-
-def init_db(conn):
-    """Fungsi inisialisasi DB, dipanggil sekali."""
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS employees (
-            nrp TEXT PRIMARY KEY,
-            name TEXT,
-            quota INTEGER DEFAULT 168
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS claims (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nrp TEXT,
-            claim_date TEXT,
-            claim_time TEXT
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS metadata (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    ''')
-    conn.commit()
-
-# Inisialisasi DB hanya sekali
-conn = get_db_connection()
-init_db(conn)
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+from makansiang.cache import get_cache, sync_cache
+from makansiang.claims import (
+    ClaimResult, HISTORY_PAGE_SIZE, add_claim, add_employee, check_daily_counters,
+    get_claim_today, get_daily_counter, get_employee, get_history_day_counts,
+    get_history_page, get_last_claim, reset_quota,
+)
+from makansiang.db import DAILY_QUOTA, db_write, get_db_pools
+from makansiang.maintenance import get_maintenance_scheduler
+from makansiang.metrics import (
+    METRICS_ENABLED, METRICS_PORT, METRICS_WINDOW, get_metrics, start_metrics_exporter, timed,
+)
+from makansiang.queries import SLOW_QUERY_MS, get_query_profiler
+
+logger = logging.getLogger(__name__)
+
+# Awal run script ini; latensi kiosk diukur dari sini sampai hasil klaim tampil
+script_started = time.perf_counter()
+
+# Data & logika klaim ada di paket makansiang (di-import sekali per proses);
+# file ini hanya UI. pandas/numpy/Plotly baru di-import saat tab admin dibuka.
+# Inisialisasi DB hanya sekali per proses (init_db dipanggil di dalam get_db_pools)
+get_db_pools()
 
 
 # =========================
@@ -59,142 +48,30 @@ if 'is_initial_load' not in st.session_state:
 if 'claim_success' not in st.session_state:
     st.session_state['claim_success'] = False
 
+def open_claim_modal(name):
+    """Tandai klaim berhasil; modal tampil di akhir script pada run yang sama."""
+    jakarta_now = datetime.now(ZoneInfo("Asia/Jakarta"))
+    st.session_state['claim_success'] = True
+    st.session_state['claimed_name'] = name
+    st.session_state['claimed_date_str'] = jakarta_now.strftime("%A, %d %B %Y") # Tanggal
+    st.session_state['claimed_time'] = jakarta_now.strftime("%H:%M:%S") # Waktu
 
-# =================================================================
-# 🟢 PERBAIKAN STABILITAS: AUTO RESET KUOTA HARIAN (Dengan st.rerun)
-# =================================================================
-def auto_reset_daily():
-    """Reset kuota harian dan update metadata. Dipanggil di awal setiap run."""
-        
-    conn = get_db_connection()
-    # Menggunakan Asia/Jakarta untuk memastikan reset tepat pukul 00.00 WIB
-    today = datetime.now(ZoneInfo("Asia/Jakarta")).date().isoformat()
-    c = conn.cursor()
-    
-    # 1. Cek tanggal reset terakhir dari metadata
-    c.execute("SELECT value FROM metadata WHERE key='last_reset'")
-    row_date = c.fetchone()
-    
-    # 2. Cek apakah ada karyawan yang kuotanya sudah terpakai (< 168)
-    # Ini untuk menghindari reset yang tidak perlu jika kuota sudah 168 semua
-    c.execute("SELECT COUNT(*) FROM employees WHERE quota < 168")
-    employees_used_quota = c.fetchone()[0]
-
-    # Kondisi RESET OTOMATIS:
-    # A. Belum pernah direset hari ini (tanggal tidak cocok)
-    # B. DAN, ada karyawan yang kuotanya sudah terpakai.
-    if (not row_date or row_date[0] != today) and employees_used_quota > 0:
-        
-        st.info(f"Otomatis mereset kuota makan siang menjadi 168 untuk tanggal {today}...") 
-        
-        # Lakukan MUTASI (Database Update)
-        c.execute("UPDATE employees SET quota = 168")
-        c.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('last_reset', ?)", (today,))
-        conn.commit()
-        
-        # Membersihkan SEMUA cache yang relevan
-        get_employee.clear()
-        get_claim_today.clear()
-        get_all_claims.clear()
-        get_last_claim.clear() 
-        
-        st.warning("⚠️ Kuota telah direset. Halaman akan dimuat ulang...")
-        time.sleep(1.0) 
-        st.rerun() # <--- KUNCI: Memaksa Streamlit untuk me-refresh
-    
-# =========================
-# AUTO DELETE HISTORY > 3 HARI (Fungsi didefinisikan di sini)
-# =========================
-def cleanup_old_claims():
-    """Hapus klaim yang lebih dari 3 hari."""
-    conn = get_db_connection()
-    # Batas hapus 3 hari
-    limit = (date.today() - timedelta(days=3)).isoformat()
-    c = conn.cursor()
-    c.execute("DELETE FROM claims WHERE claim_date < ?", (limit,))
-    conn.commit()
-    
-
-# =========================
-# HELPERS (MENGGUNAKAN CACHING)
-# =========================
-@st.cache_data(ttl=60) # Cache data karyawan selama 60 detik
-def get_employee(nrp):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM employees WHERE nrp=?", (nrp,))
-    row = c.fetchone()
-    return row
-
-@st.cache_data(ttl=60) # Cache klaim hari ini selama 60 detik
-def get_claim_today(nrp):
-    today = date.today().isoformat()
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM claims WHERE nrp=? AND claim_date=?", (nrp, today))
-    row = c.fetchone()
-    return row
-
-@st.cache_data(ttl=5) # Cache data klaim total selama 5 detik
-def get_all_claims():
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT * FROM claims", conn)
-    return df
-
-# 🟢 FUNGSI BARU: Live Feed Klaim Terakhir
-@st.cache_data(ttl=1) # Cache hanya 1 detik agar 'live'
-def get_last_claim():
-    conn = get_db_connection()
-    # Mengambil klaim terakhir dengan nama karyawan
-    query = """
-        SELECT c.claim_time, e.name
-        FROM claims c
-        JOIN employees e ON c.nrp = e.nrp
-        ORDER BY c.id DESC
-        LIMIT 1
-    """
-    c = conn.cursor()
-    c.execute(query)
-    row = c.fetchone()
-    if row:
-        # Mengembalikan string yang diformat: "Nama (Waktu)"
-        return f"Terakhir Klaim: {row[1]} ({row[0]})"
-    return "Belum ada klaim hari ini."
-
-
-# Fungsi yang memodifikasi DB (tidak boleh di-cache)
-def add_employee(nrp, name):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("INSERT OR IGNORE INTO employees (nrp, name) VALUES (?, ?)", (nrp, name))
-    conn.commit()
-    # Mutation: Invalidate cache
-    get_employee.clear()
-
-def add_claim(nrp):
-    conn = get_db_connection()
-    today = date.today().isoformat()
-    now_time = datetime.now(ZoneInfo("Asia/Jakarta")).strftime("%H:%M:%S")
-    
-    # Perlu memanggil fungsi add_claim yang tidak di-cache
-    c = conn.cursor()
-    c.execute("INSERT INTO claims (nrp, claim_date, claim_time) VALUES (?, ?, ?)",
-              (nrp, today, now_time))
-    c.execute("UPDATE employees SET quota = quota - 1 WHERE nrp=?", (nrp,))
-    conn.commit()
-
-    # Mutation: Invalidate relevant caches
-    get_employee.clear()
-    get_claim_today.clear()
-    get_all_claims.clear()
-    get_last_claim.clear() # Tambahan: Invalidate cache live feed
+def close_claim_modal():
+    """Callback tombol "Selesai" (dijalankan sebelum rerun, tanpa st.rerun tambahan)."""
+    st.session_state['claim_success'] = False
+    st.toast("Klaim tercatat. Selamat makan! 🍱")
 
 
 # =================================================
 # 🔑 PANGGILAN FUNGSI SETELAH SEMUA DEFIISI SELESAI
 # =================================================
-auto_reset_daily() 
-cleanup_old_claims()
+# Reset & cleanup tidak lagi jalan di setiap rerun; cukup pastikan thread
+# maintenance sudah hidup (tanpa write di jalur interaktif).
+get_maintenance_scheduler()
+start_metrics_exporter()
+get_query_profiler()
+# Invalidasi dari proses app lain (klaim, reset, import) sebelum membaca cache
+sync_cache()
 
 
 # =========================
@@ -202,19 +79,105 @@ cleanup_old_claims()
 # =========================
 st.set_page_config(page_title="UT Yard Sukapura - Lunch Claim", layout="centered")
 
-# FUNGSI LOAD GAMBAR BASE64
-def load_base64_image(path, mime_type="image/png"):
-    try:
-        with open(path, "rb") as f:
-            data = f.read()
-        return f"data:{mime_type};base64,{base64.b64encode(data).decode()}"
-    except:
-        return None
+# =========================
+# ASET GAMBAR (SEKALI PER PROSES)
+# =========================
+# Gambar diperkecil & dikonversi (WebP jika Pillow tersedia), lalu ditulis ke
+# static/assets dengan nama ber-hash: browser cukup cache/revalidasi file
+# kecil itu, dan URL otomatis berubah saat gambar diganti. Hash diambil dari
+# file sumber + pengaturan optimasi, jadi proses berikutnya langsung memakai
+# file yang sudah ada tanpa encode ulang.
+# Butuh server.enableStaticServing (lihat .streamlit/config.toml); jika mati
+# atau folder tidak bisa ditulis, fallback ke data URI hasil optimasi.
+STATIC_DIR = Path(__file__).parent / "static"
+ASSET_DIR = STATIC_DIR / "assets"
+IMAGE_ASSETS = {
+    # nama: (file sumber, lebar maksimum px = ukuran tampil x2 untuk layar HiDPI)
+    "logo": ("abai.png", 256),
+    "food": ("pdg.png", 1280),
+}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_WEBP_METHOD = 4  # method=6 ~25x lebih lambat untuk file ~2% lebih kecil
+
+def pillow_available():
+    """Optimasi gambar butuh Pillow (opsional); tanpa Pillow file asli dipakai apa adanya."""
+    return importlib.util.find_spec("PIL") is not None
+
+def _optimize_image(path, max_width):
+    """(bytes, ekstensi, mime) gambar yang sudah diperkecil."""
+    if not pillow_available():
+        ext = Path(path).suffix.lstrip(".").lower()
+        return Path(path).read_bytes(), ext, f"image/{ext}"
+
+    from PIL import Image, features
+
+    with Image.open(path) as img:
+        img.thumbnail((max_width, max_width * 4))
+        out = io.BytesIO()
+        if features.check("webp"):
+            img.save(out, "WEBP", quality=IMAGE_WEBP_QUALITY, method=IMAGE_WEBP_METHOD)
+            return out.getvalue(), "webp", "image/webp"
+        img.save(out, "PNG", optimize=True)
+        return out.getvalue(), "png", "image/png"
+
+def _asset_digest(path, max_width):
+    """Hash file sumber + pengaturan optimasi (bagian nama file aset)."""
+    settings = f"{max_width}:{IMAGE_WEBP_QUALITY}:{IMAGE_WEBP_METHOD}:{pillow_available()}"
+    return hashlib.sha256(Path(path).read_bytes() + settings.encode()).hexdigest()[:12]
+
+def _find_asset(name, digest):
+    """URL aset yang sudah ditulis untuk digest ini, atau None."""
+    for path in ASSET_DIR.glob(f"{name}.{digest}.*"):
+        if path.suffix != ".tmp":
+            return f"app/static/assets/{path.name}"
+    return None
+
+def _publish_asset(name, digest, data, ext):
+    """Tulis ke static/assets/<nama>.<digest>.<ext> (sekali) dan kembalikan URL-nya."""
+    filename = f"{name}.{digest}.{ext}"
+    path = ASSET_DIR / filename
+    if not path.exists():
+        ASSET_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        # Versi lama aset yang sama tidak dipakai lagi
+        for old in ASSET_DIR.glob(f"{name}.*.{ext}"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    return f"app/static/assets/{filename}"
 
-# Load gambar. Catatan: file "abai.png" dan "pdg.png" harus ada di direktori yang sama
-# ASUMSI: File-file ini ada di direktori yang sama saat dijalankan di Streamlit Cloud
-base64_logo = load_base64_image("abai.png", "image/png")
-base64_food_image = load_base64_image("pdg.png", "image/png")
+@st.cache_resource
+def get_image_assets():
+    """URL tiap gambar di IMAGE_ASSETS (None jika file sumber tidak ada)."""
+    static_serving = st.get_option("server.enableStaticServing")
+    urls = {}
+    for name, (source, max_width) in IMAGE_ASSETS.items():
+        try:
+            digest = _asset_digest(source, max_width)
+            existing = _find_asset(name, digest) if static_serving else None
+            if existing:
+                urls[name] = existing
+                continue
+            data, ext, mime = _optimize_image(source, max_width)
+        except OSError:
+            logger.warning("Gambar %s tidak ditemukan / tidak bisa dibaca", source)
+            urls[name] = None
+            continue
+        if static_serving:
+            try:
+                urls[name] = _publish_asset(name, digest, data, ext)
+                continue
+            except OSError:
+                logger.exception("Gagal menulis aset %s, pakai data URI", name)
+        urls[name] = f"data:{mime};base64,{base64.b64encode(data).decode()}"
+    return urls
+
+# Catatan: file "abai.png" dan "pdg.png" harus ada di direktori yang sama
+with timed("section", "assets"):
+    image_assets = get_image_assets()
+logo_src = image_assets["logo"]
+food_image_src = image_assets["food"]
 
 PRIMARY = "#FFD200"
 BG = "#F7F7F9"
@@ -224,14 +187,30 @@ ACCENT = "#FFD200"
 
 
 # =========================
-# CSS FULL + HERO BACKGROUND HEADER
+# TEMA (CSS SEKALI PER PROSES)
 # =========================
-st.markdown(f"""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@400;600;700&display=swap');
-
+# Stylesheet dibangun + di-minify sekali per proses lalu dipasang sebagai
+# <style> di <head> halaman oleh script kecil, sekali per sesi browser.
+# Sengaja tidak lewat static/: Streamlit < 1.51 menyajikan .css sebagai
+# text/plain + nosniff, sehingga browser menolak stylesheet-nya.
+# Font tanpa Google Fonts (jaringan yard tidak bisa akses) dan tanpa file
+# font dibundel: Montserrat dipakai jika terpasang di perangkat, selain itu
+# font sistem.
+FONT_STACK = "'Montserrat', system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif"
+
+def minify_css(css):
+    """Buang komentar & spasi berlebih (aman untuk CSS di file ini)."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+def build_theme_css(food_image_src):
+    """CSS lengkap aplikasi (hero, splash, marquee, tab, modal) dari konstanta warna."""
+    return f"""
 html, body, [class*="css"] {{
-    font-family: 'Montserrat', sans-serif;
+    font-family: {FONT_STACK};
 }}
 
 /* Kontainer utama lebih responsif */
@@ -274,10 +253,25 @@ body {{
     justify-content: center;
     align-items: center;
     opacity: 1;
-    transition: opacity 0.5s ease-out 2.0s; /* Fade out setelah animasi utama selesai */
+    /* Fade out murni CSS setelah animasi logo selesai (tanpa sleep + rerun di server) */
+    animation: splashOut 0.5s ease-out 2.0s forwards;
     pointer-events: none; /* Agar tidak menghalangi interaksi setelah fade out */
 }}
 
+@keyframes splashOut {{
+    to {{ opacity: 0; visibility: hidden; }}
+}}
+
+/* Hero muncul saat splash menghilang (hanya pada load pertama) */
+.ut-hero.ut-hero-intro {{
+    animation: heroIntro 0.5s ease 2.0s both, kenBurns 8s ease-in-out infinite alternate;
+}}
+
+@keyframes heroIntro {{
+    from {{ opacity: 0; }}
+    to   {{ opacity: 1; }}
+}}
+
 .ut-splash-logo {{
     /* Logo Awal: Besar di tengah layar */
     height: 120px;
@@ -349,7 +343,7 @@ body {{
     border-radius: 18px;
     overflow: hidden;
     position: relative;
-    background-image: url('{base64_food_image}');
+    background-image: url('{food_image_src}');
     /* MODIFIKASI: APLIKASIKAN ANIMASI GERAK */
     background-size: 110%; /* Default 110% agar ada ruang untuk animasi */
     background-position: center;
@@ -521,8 +515,191 @@ div[data-baseweb="tab-list"] {{
     font-size: 15px !important;
     font-weight: 600 !important;
 }}
-</style>
-""", unsafe_allow_html=True)
+
+/* =====================================================
+   MODAL POP-UP KLAIM BERHASIL
+===================================================== */
+    /* Animasi Icon Checklist (LEBIH CEPAT & MENCILOK) */
+    @keyframes iconScale {{
+        0% {{ transform: scale(0); opacity: 0; }}
+        80% {{ transform: scale(1.15); opacity: 1; }} /* Pantulan lebih besar */
+        100% {{ transform: scale(1); opacity: 1; }}
+    }}
+    
+    @keyframes pulse {{
+        0% {{ box-shadow: 0 0 0 0 rgba(255, 255, 255, 0.6); }} /* Lebih terang */
+        70% {{ box-shadow: 0 0 0 25px rgba(255, 255, 255, 0); }} /* Radius bayangan lebih besar */
+        100% {{ box-shadow: 0 0 0 0 rgba(255, 255, 255, 0); }}
+    }}
+    
+    /* Overlay Full Screen */
+    .full-screen-modal-overlay {{
+        position: fixed;
+        top: 0;
+        left: 0;
+        width: 100%;
+        height: 100%;
+        background-color: rgba(0, 0, 0, 0.7);
+        backdrop-filter: blur(4px);
+        z-index: 9999; 
+        display: flex;
+        justify-content: center;
+        align-items: center;
+        animation: fadeInOverlay 0.3s ease-out;
+        /* Anti-screenshot */
+        pointer-events: auto; 
+        user-select: none;
+        -webkit-user-select: none;
+        -moz-user-select: none;
+    }}
+
+    /* Elemen Animasi Anti-Screenshot (Blinking) */
+    .anti-screenshot-flicker {{
+        position: absolute;
+        top: 0;
+        left: 0;
+        width: 100%;
+        height: 100%;
+        background-color: rgba(255, 255, 255, 0.01);
+        z-index: 10000; 
+        animation: flicker 0.2s infinite alternate; 
+        pointer-events: none;
+    }}
+
+    /* Keyframes untuk flicker */
+    @keyframes flicker {{
+        from {{ opacity: 0; }}
+        to {{ opacity: 0.1; }}
+    }}
+
+    /* Konten Modal (FULL SCREEN) */
+    .modal-content {{
+        background: linear-gradient(145deg, #28A745, #2ECC71); /* Gradien Hijau Sukses */
+        color: white;
+        border-radius: 20px;
+        padding: 50px 30px; 
+        max-width: 95%; 
+        width: 90%; 
+        height: 80vh; 
+        display: flex;
+        flex-direction: column;
+        justify-content: center; 
+        align-items: center;
+        text-align: center;
+        box-shadow: 0 15px 40px rgba(0, 0, 0, 0.4);
+        animation: popUp 0.4s cubic-bezier(0.68, -0.55, 0.265, 1.55);
+        z-index: 10001; 
+    }}
+    
+    /* Icon Centang */
+    .success-icon {{
+        color: white; 
+        font-size: 70px; 
+        margin-bottom: 30px; 
+        font-weight: 900;
+        line-height: 1;
+        border: 6px solid white; 
+        border-radius: 50%;
+        width: 120px; 
+        height: 120px; 
+        display: inline-flex;
+        justify-content: center;
+        align-items: center;
+        /* DURASI LEBIH CEPAT: iconScale 0.4s, pulse 1.2s, delay 0.4s */
+        animation: 
+            iconScale 0.4s cubic-bezier(0.68, -0.55, 0.265, 1.55) forwards, 
+            pulse 1.2s infinite 0.4s; 
+    }}
+
+    /* TEXT FONT SIZE INCREASE */
+    .modal-content h2 {{
+        color:white; 
+        margin-top:10px; 
+        font-weight:800; 
+        font-size:50px; /* Diperbesar dari 40px ke 50px */
+    }}
+    .modal-content p:nth-child(2) {{ /* Pesan Selamat Makan */
+        font-size:42px; /* Diperbesar dari 30px ke 42px */
+        font-weight:700; 
+        margin-bottom:15px; 
+        margin-top:10px;
+    }}
+    .modal-content p:nth-child(3), .modal-content p:nth-child(4) {{ /* Tanggal & Waktu Klaim */
+        font-size:28px; /* Diperbesar dari 20px ke 28px */
+        color:#F0F0F0; 
+        margin-top:0;
+    }}
+
+    /* Animasi Dasar Modal */
+    @keyframes fadeInOverlay {{ from {{ opacity: 0; }} to {{ opacity: 1; }} }}
+    @keyframes popUp {{
+        from {{ transform: scale(0.7); opacity: 0; }}
+        to {{ transform: scale(1); opacity: 1; }}
+    }}
+
+    /* Tombol Streamlit untuk nutup */
+    .stButton button[data-testid*="modal_streamlit_button"] {{
+        position: fixed; 
+        bottom: 10vh; 
+        left: 50%;
+        transform: translateX(-50%); 
+        width: 320px !important;
+        max-width: 80%;
+        z-index: 10002; 
+        margin: 0;
+        
+        /* Style tombol Streamlit */
+        background: linear-gradient(90deg, #FFD200, #FFE766);
+        color: black;
+        border: none;
+        padding: 18px 20px; 
+        border-radius: 10px;
+        font-size: 24px; /* Diperbesar dari 20px ke 24px */
+        font-weight: 700;
+        cursor: pointer;
+        box-shadow: 0 4px 12px rgba(255,210,32,0.3);
+        transition: transform 0.1s;
+    }}
+    .stButton button[data-testid*="modal_streamlit_button"]:hover {{
+        transform: translate(-50%, -1px);
+    }}
+"""
+
+@st.cache_resource
+def get_theme():
+    """CSS tema minified (sekali per proses)."""
+    return minify_css(build_theme_css(get_image_assets()["food"]))
+
+def embed_script(script):
+    """Render <script> di iframe tak terlihat (bisa akses halaman induk)."""
+    # st.iframe menggantikan components.html di Streamlit versi baru
+    if hasattr(st, "iframe"):
+        st.iframe(script)  # tinggi mengikuti isi (kosong)
+    else:
+        components.html(script, height=0)
+
+def inject_theme():
+    """Pasang stylesheet di <head> halaman; node tetap ada di antara rerun.
+
+    Script dirender setiap rerun dengan isi yang sama, jadi iframe-nya tidak
+    dimuat ulang dan CSS hanya dipasang sekali per sesi browser.
+    """
+    css = get_theme()
+    node_id = "lunch-theme-" + hashlib.sha256(css.encode()).hexdigest()[:12]
+    script = f"""<script>
+const doc = window.parent.document;
+if (!doc.getElementById("{node_id}")) {{
+    doc.querySelectorAll("[data-lunch-theme]").forEach(n => n.remove());
+    const el = doc.createElement('style');
+    el.textContent = {json.dumps(css)};
+    el.id = "{node_id}"; el.dataset.lunchTheme = "1";
+    doc.head.appendChild(el);
+}}
+</script>"""
+    embed_script(script)
+
+with timed("section", "theme"):
+    inject_theme()
 
 
 # =========================
@@ -530,43 +707,131 @@ div[data-baseweb="tab-list"] {{
 # =========================
 
 # --- Logic Splash Screen ---
-# Tampilkan splash screen hanya pada load pertama
+# Tampilkan splash screen hanya pada load pertama. Timing fade-out diatur
+# CSS (splashOut/heroIntro), script langsung lanjut tanpa sleep atau rerun.
+hero_class = "ut-hero"
 if st.session_state.get('is_initial_load', True):
-    
+    st.session_state['is_initial_load'] = False
+    hero_class += " ut-hero-intro"
+
     # Render HTML untuk Splash Screen
     st.markdown(f"""
     <div class="ut-splash-screen" id="ut-splash">
-        <img class="ut-splash-logo" src="{base64_logo}" id="ut-splash-logo">
+        <img class="ut-splash-logo" src="{logo_src}" id="ut-splash-logo">
     </div>
     """, unsafe_allow_html=True)
-    
-    # Render Hero Header di background, tetapi tersembunyi
-    st.markdown(f"""
-    <div class="ut-hero" style="opacity:0; transition: opacity 0.5s ease 2.0s; margin-bottom: 22px;">
-        <div class="ut-hero-overlay">
-            <img class="ut-hero-logo" src="{base64_logo}">
-            <h1>UT Yard Sukapura — Lunch Claim System</h1>
-        </div>
+
+st.markdown(f"""
+<div class="{hero_class}">
+    <div class="ut-hero-overlay">
+        <img class="ut-hero-logo" src="{logo_src}">
+        <h1>UT Yard Sukapura — Lunch Claim System</h1>
     </div>
-    """, unsafe_allow_html=True)
-    
-    # Setelah 2.5 detik (cukup untuk animasi), nonaktifkan splash screen
-    if st.session_state['is_initial_load']:
-        time.sleep(2.5) 
-        st.session_state['is_initial_load'] = False
-        st.rerun() 
-        
-else:
-    # --- Konten Utama (Setelah Splash Screen) ---
+</div>
+""", unsafe_allow_html=True)
+
+# =========================
+# MODE KIOSK (?mode=kiosk)
+# =========================
+# Untuk pembaca barcode / RFID di pintu kantin: satu field NRP dalam form,
+# Enter = submit. Nama diambil dari employees, tidak ada tulis sebelum klaim.
+KIOSK_LATENCY_TARGET_MS = 100
+KIOSK_LATENCY_WINDOW = 500  # jumlah klaim terakhir untuk p50/p95
+
+class LatencyWindow:
+    """Latensi (ms) N klaim terakhir, dipakai bersama semua sesi kiosk."""
+
+    def __init__(self, size=KIOSK_LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, ms):
+        with self._lock:
+            self._samples.append(ms)
+
+    def summary(self):
+        import numpy as np
+
+        with self._lock:
+            samples = np.array(self._samples, dtype=float)
+        if not len(samples):
+            return None
+        return {
+            "count": len(samples),
+            "p50": float(np.percentile(samples, 50)),
+            "p95": float(np.percentile(samples, 95)),
+            "over_target": int((samples > KIOSK_LATENCY_TARGET_MS).sum()),
+        }
+
+@st.cache_resource
+def get_kiosk_latency():
+    return LatencyWindow()
+
+def kiosk_claim(nrp):
+    """Lookup nama lalu klaim. NRP tak dikenal ditolak tanpa menyentuh writer."""
+    emp = get_employee(nrp)
+    if emp is None:
+        return {"nrp": nrp, "name": None, "result": ClaimResult.UNKNOWN_EMPLOYEE}
+    return {"nrp": nrp, "name": emp[1] or nrp, "result": add_claim(nrp)}
+
+KIOSK_MESSAGES = {
+    ClaimResult.CLAIMED: ("linear-gradient(145deg, #28A745, #2ECC71)", "✓ Selamat Makan, {name}!"),
+    ClaimResult.ALREADY_CLAIMED: ("linear-gradient(145deg, #1D4ED8, #3B82F6)", "{name} sudah klaim hari ini."),
+    ClaimResult.QUOTA_EXHAUSTED: ("linear-gradient(145deg, #B91C1C, #EF4444)", "Kuota {name} telah habis."),
+    ClaimResult.UNKNOWN_EMPLOYEE: ("linear-gradient(145deg, #B91C1C, #EF4444)", "NRP {nrp} tidak terdaftar."),
+    ClaimResult.FAILED: ("linear-gradient(145deg, #B45309, #F59E0B)", "Klaim belum tercatat, silakan scan ulang."),
+}
+
+@timed("section", "kiosk")
+def render_kiosk():
+    total_used, _ = get_daily_counter(date.today().isoformat())
     st.markdown(f"""
-    <div class="ut-hero">
-        <div class="ut-hero-overlay">
-            <img class="ut-hero-logo" src="{base64_logo}">
-            <h1>UT Yard Sukapura — Lunch Claim System</h1>
+        <div class="card" style="text-align:center;">
+            <h3 style="margin:0;font-weight:700;">Scan Kartu / Ketik NRP lalu Enter</h3>
+            <div style="margin-top:4px;color:#6B7280;">Sisa kupon hari ini: {DAILY_QUOTA - total_used} / {DAILY_QUOTA}</div>
         </div>
-    </div>
     """, unsafe_allow_html=True)
 
+    with st.form("kiosk_form", clear_on_submit=True):
+        nrp = st.text_input("NRP", placeholder="NRP")
+        submitted = st.form_submit_button("Klaim", use_container_width=True)
+
+    if submitted and nrp.strip():
+        outcome = kiosk_claim(nrp.strip())
+        outcome["latency_ms"] = (time.perf_counter() - script_started) * 1000
+        get_kiosk_latency().record(outcome["latency_ms"])
+        st.session_state['kiosk_result'] = outcome
+        st.session_state['kiosk_scans'] = st.session_state.get('kiosk_scans', 0) + 1
+
+    outcome = st.session_state.get('kiosk_result')
+    if outcome:
+        background, message = KIOSK_MESSAGES[outcome["result"]]
+        st.markdown(f"""
+            <div class="card" style="background:{background};color:white;text-align:center;padding:28px 16px;">
+                <div style="font-size:32px;font-weight:800;">{message.format(**outcome)}</div>
+                <div style="margin-top:6px;opacity:0.85;">NRP {outcome["nrp"]}</div>
+            </div>
+        """, unsafe_allow_html=True)
+
+    stats = get_kiosk_latency().summary()
+    if outcome and stats:
+        st.caption(
+            f"⏱ {outcome['latency_ms']:.0f} ms · p50 {stats['p50']:.0f} ms · p95 {stats['p95']:.0f} ms "
+            f"(target {KIOSK_LATENCY_TARGET_MS} ms, {stats['over_target']}/{stats['count']} di atas target)"
+        )
+
+    # Fokus kembali ke field NRP agar scan berikutnya langsung masuk
+    # (nomor scan membuat isi iframe berubah sehingga script jalan lagi)
+    embed_script(f"""<script>
+// scan {st.session_state.get('kiosk_scans', 0)}
+const input = window.parent.document.querySelector('input[aria-label="NRP"]');
+if (input) {{ input.focus(); }}
+</script>""")
+
+if st.query_params.get("mode") == "kiosk":
+    render_kiosk()
+    st.stop()
+
 # =========================
 # MULAI MAIN WRAPPER
 # =========================
@@ -579,29 +844,27 @@ tab1, tab2, tab3 = st.tabs(["Karyawan", "Admin", "Bantuan"])
 
 
 # =========================
-# TAB 1 — KARYAWAN
+# LIVE STATUS (FRAGMENT)
 # =========================
-with tab1:
-
-    st.markdown(
-        "<h2 style='text-align:center; letter-spacing:0.3px; font-weight:700; font-size: 26px; line-height: 1.2;'>— Klaim Makan Siang —</h2>",
-        unsafe_allow_html=True
-    )
-
-    today = date.today().isoformat()
-
-    # Menggunakan fungsi helper dengan caching
-    all_claims_df = get_all_claims()
-    total_used = all_claims_df[all_claims_df['claim_date'] == today].shape[0]
-
-    remaining = 168 - total_used
+# Card sisa kupon dan running text klaim terakhir dijalankan ulang sendiri
+# tiap LIVE_REFRESH_SECONDS; bagian halaman lain tidak ikut rerun. Keduanya
+# hanya membaca counter harian & klaim terakhir yang di-cache per data_version.
+LIVE_REFRESH_SECONDS = 3
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+@timed("section", "live_status")
+def live_status():
+    sync_cache()
+    # Counter harian (satu baris), bukan memuat semua klaim
+    total_used, _ = get_daily_counter(date.today().isoformat())
+    remaining = DAILY_QUOTA - total_used
 
     # Card sisa kupon
     st.markdown(f"""
         <div class="card" style="background: linear-gradient(135deg, #1D4ED8, #3B82F6);
                                  color:white; box-shadow:0 8px 18px rgba(29,78,216,0.35);">
             <h3 style="margin:0;font-weight:700;">Sisa Kupon Hari Ini</h3>
-            <div style="font-size:34px;margin-top:1px;">{remaining} / 168</div>
+            <div style="font-size:34px;margin-top:1px;">{remaining} / {DAILY_QUOTA}</div>
         </div>
     """, unsafe_allow_html=True)
 
@@ -614,6 +877,20 @@ with tab1:
     """, unsafe_allow_html=True)
 
 
+# =========================
+# TAB 1 — KARYAWAN
+# =========================
+with tab1, timed("section", "tab_karyawan"):
+
+    st.markdown(
+        "<h2 style='text-align:center; letter-spacing:0.3px; font-weight:700; font-size: 26px; line-height: 1.2;'>— Klaim Makan Siang —</h2>",
+        unsafe_allow_html=True
+    )
+
+    # Card sisa kupon + live feed, di-refresh sendiri tanpa rerun halaman
+    live_status()
+
+
     # Input data karyawan
     nrp = st.text_input("NRP:")
     name = st.text_input("Nama Lengkap:")
@@ -623,10 +900,7 @@ with tab1:
     disable_button = False
     
     if nrp and name:
-        # Memastikan nama karyawan ditambahkan/diperbarui sebelum pengecekan
-        add_employee(nrp, name)
-        
-        # Panggil fungsi yang di-cache
+        # Hanya baca (cache); karyawan baru baru ditulis saat tombol ditekan
         emp = get_employee(nrp)
         claimed_today = get_claim_today(nrp)
         # Nonaktifkan jika sudah klaim, kuota habis, atau pop-up sedang aktif
@@ -643,52 +917,55 @@ with tab1:
             st.warning("⚠️ Mohon isi NRP dan Nama terlebih dahulu.")
         else:
             
-            # Re-fetch data setelah yakin input valid dan karyawan sudah di-add/update
-            emp_data = get_employee(nrp)
-            claimed_today = get_claim_today(nrp)
-
+            # Spinner hanya tampil selama klaim benar-benar diproses
             with st.spinner("Sedang memproses..."):
-                time.sleep(0.5) 
+                if emp is None:
+                    add_employee(nrp, name)
+                # Cek & klaim dilakukan database dalam satu transaksi
+                result = add_claim(nrp)
+
+            if result is ClaimResult.QUOTA_EXHAUSTED:
+                st.error("❌ Kuota makan siang Anda telah habis.")
 
-                if emp_data and emp_data[2] <= 0:
-                    st.error("❌ Kuota makan siang Anda telah habis.")
+            elif result is ClaimResult.ALREADY_CLAIMED:
+                st.info("Kamu sudah klaim makan siang hari ini.")
 
-                elif claimed_today:
-                    st.info("Kamu sudah klaim makan siang hari ini.")
+            elif result is ClaimResult.UNKNOWN_EMPLOYEE:
+                st.error("❌ NRP tidak terdaftar.")
 
-                else:
-                    # LOGIKA NOTIFIKASI POP-UP
-                    add_claim(nrp)
-                    
-                    # Ambil waktu klaim saat ini
-                    jakarta_now = datetime.now(ZoneInfo("Asia/Jakarta"))
-                    
-                    st.session_state['claim_success'] = True
-                    st.session_state['claimed_name'] = name
-                    st.session_state['claimed_date_str'] = jakarta_now.strftime("%A, %d %B %Y") # Tanggal
-                    st.session_state['claimed_time'] = jakarta_now.strftime("%H:%M:%S") # Waktu
+            elif result is ClaimResult.FAILED:
+                st.warning("⚠️ Sistem sedang sibuk, klaim belum tercatat. Silakan tekan tombol lagi.")
 
-                    st.rerun() 
+            else:
+                # Modal dirender di akhir script pada run yang sama (tanpa st.rerun)
+                open_claim_modal(name)
 
 
 # =========================
 # TAB 2 — ADMIN
 # =========================
-with tab2:
+with tab2, timed("section", "tab_admin"):
 
     st.header("🔒 Admin Panel")
     admin_pass = st.text_input("Masukkan Password Admin:", type="password")
 
     if admin_pass == "admin123":
 
-        quota = 168
-        today = date.today().isoformat()
-        
-        # Menggunakan fungsi helper dengan caching
-        all_claims_df_admin = get_all_claims()
-        today_used = all_claims_df_admin[all_claims_df_admin['claim_date'] == today].shape[0]
+        # Dependensi berat (pandas, numpy, Plotly) hanya dimuat untuk admin
+        import pandas as pd
+        from makansiang.analytics import (
+            get_dashboard_snapshot, get_rollup_day, get_rollup_month, get_rollup_months,
+            load_claim_columns, queue_summary, rollup_backfill_pending, subtract_claims_from_rollups,
+        )
+        from makansiang.archive import get_archive_monthly_report, get_archive_months
+        from makansiang.employees import import_employees_csv
+        from makansiang.exports import EXPORT_MIME, export_claims, filename_part, parquet_available
 
-        not_claimed = quota - today_used
+        # Snapshot (dibangun ulang hanya saat angka hari ini berubah), bukan query + chart per rerun
+        snapshot = get_dashboard_snapshot()
+        quota = snapshot["quota"]
+        today_used = snapshot["today_used"]
+        not_claimed = snapshot["not_claimed"]
 
         # ===== CARD INFO =====
         st.markdown(f"""
@@ -711,13 +988,8 @@ with tab2:
         st.divider()
 
         # ===== PIE CHART =====
-        fig = px.pie(
-            names=["Sudah Klaim", "Belum Klaim"],
-            values=[today_used, not_claimed],
-            hole=0.45
-        )
-        fig.update_traces(textinfo='percent+label')
-        st.plotly_chart(fig, use_container_width=True)
+        with timed("section", "admin_chart"):
+            st.plotly_chart(snapshot["figure"], use_container_width=True)
 
         st.divider()
 
@@ -726,68 +998,171 @@ with tab2:
         # =========================
         st.subheader("📅 History Klaim 3 Hari Terakhir")
 
-        conn = get_db_connection()
         # Mengubah periode query dari 7 hari menjadi 3 hari
         last3 = (date.today() - timedelta(days=3)).isoformat()
 
-        # Query history langsung, karena get_all_claims hanya mengembalikan semua klaim
-        history = pd.read_sql_query("""
-            SELECT claims.nrp, employees.name, claims.claim_date, claims.claim_time
-            FROM claims
-            JOIN employees ON claims.nrp = employees.nrp
-            WHERE claims.claim_date >= ?
-            ORDER BY claims.claim_date DESC, claims.claim_time DESC
-        """, conn, params=(last3,))
+        # Jumlah per tanggal dari counter harian, bukan dari DataFrame history
+        day_counts = get_history_day_counts(last3)
 
-        if not history.empty:
-            
-            # Mendapatkan daftar tanggal unik, diurutkan dari terbaru
-            dates = history["claim_date"].unique()
-            
-            for d in dates:
-                # Filter data untuk tanggal saat ini
-                daily_history = history[history["claim_date"] == d]
-                
-                # Format tanggal agar mudah dibaca
+        if day_counts:
+
+            # Format tanggal agar mudah dibaca
+            def format_claim_date(d):
                 try:
                     date_obj = datetime.strptime(d, '%Y-%m-%d').date()
                     # Contoh format: 'Thursday, 20 November 2025'
-                    formatted_date = date_obj.strftime("%A, %d %B %Y") 
-                except:
-                    formatted_date = d # Fallback jika format gagal
-                
-                # Tampilkan Sub-header untuk tanggal ini
-                st.markdown(f"**Tanggal Klaim: {formatted_date}** ({daily_history.shape[0]} klaim)")
-                
-                # Tampilkan tabel data
-                st.dataframe(
-                    daily_history[['nrp', 'name', 'claim_time']].rename(columns={'claim_time': 'Waktu Klaim'}).rename(columns={'nrp': 'NRP'}).rename(columns={'name': 'Nama Karyawan'}), 
-                    use_container_width=True,
-                    hide_index=True
+                    return date_obj.strftime("%A, %d %B %Y")
+                except ValueError:
+                    return d # Fallback jika format gagal
+
+            counts_by_date = dict(day_counts)
+            dates = [d for d, _ in day_counts]
+
+            for d, n in day_counts:
+                st.markdown(f"**Tanggal Klaim: {format_claim_date(d)}** ({n} klaim)")
+
+            # Hanya satu halaman (HISTORY_PAGE_SIZE baris) yang diambil per rerun
+            selected_day = st.selectbox("Lihat klaim tanggal:", dates, format_func=format_claim_date)
+            if st.session_state.get('history_day') != selected_day:
+                st.session_state['history_day'] = selected_day
+                st.session_state['history_cursors'] = [None]
+
+            cursors = st.session_state['history_cursors']
+            page = get_history_page(selected_day, selected_day, cursors[-1])
+
+            st.dataframe(
+                pd.DataFrame(
+                    [(r[1], r[2], r[4]) for r in page],
+                    columns=['NRP', 'Nama Karyawan', 'Waktu Klaim'],
+                ),
+                use_container_width=True,
+                hide_index=True
+            )
+
+            total_pages = max(1, -(-counts_by_date[selected_day] // HISTORY_PAGE_SIZE))
+            prev_col, info_col, next_col = st.columns([1, 2, 1])
+            with prev_col:
+                # Callback mengubah cursor sebelum rerun (tanpa st.rerun kedua)
+                st.button("◀ Sebelumnya", disabled=len(cursors) == 1, on_click=cursors.pop)
+            with info_col:
+                st.markdown(
+                    f"<div style='text-align:center;'>Halaman {len(cursors)} / {total_pages}</div>",
+                    unsafe_allow_html=True
                 )
-                st.markdown("---") # Garis pemisah antar tabel harian
+            with next_col:
+                next_cursor = (page[-1][3], page[-1][4], page[-1][0]) if page else None
+                st.button("Berikutnya ▶", disabled=len(page) < HISTORY_PAGE_SIZE,
+                          on_click=cursors.append, args=(next_cursor,))
 
-            st.divider()
-            
-            # Pindahkan tombol download CSV ke luar loop harian
-            st.subheader("📥 Download Data CSV")
+        else:
+            st.info("Belum ada data pada 3 hari terakhir.") # Update pesan
+
+        st.divider()
+
+        # =========================
+        # EXPORT DATA KLAIM
+        # =========================
+        st.subheader("📥 Download Data Klaim")
+
+        export_range = st.date_input(
+            "Rentang tanggal:",
+            value=(date.today() - timedelta(days=3), date.today()),
+            max_value=date.today(),
+        )
+        export_nrp = st.text_input("Filter NRP (opsional):").strip() or None
+        export_formats = ["csv", "parquet"] if parquet_available() else ["csv"]
+        export_fmt = st.radio("Format:", export_formats, horizontal=True, format_func=str.upper)
 
-            # Pilih tanggal untuk download CSV
-            selected = st.selectbox("Pilih tanggal download CSV:", dates)
+        if isinstance(export_range, (tuple, list)) and len(export_range) == 2:
+            export_start, export_end = (d.isoformat() for d in export_range)
+            export_params = (export_start, export_end, export_nrp, export_fmt)
 
-            dl = history[history["claim_date"] == selected]
-            # Memilih kolom yang relevan untuk download
-            csv = dl[['nrp', 'name', 'claim_date', 'claim_time']].to_csv(index=False).encode('utf-8')
+            # File baru dibuat saat diminta, bukan di setiap rerun
+            if st.button("Siapkan File"):
+                try:
+                    st.session_state['export_file'] = (
+                        export_params, export_claims(export_start, export_end, export_nrp, export_fmt)
+                    )
+                except Exception as e:
+                    st.error(f"Gagal membuat file: {e}")
+
+            prepared = st.session_state.get('export_file')
+            if prepared and prepared[0] == export_params and prepared[1].exists():
+                with open(prepared[1], "rb") as f:
+                    st.download_button(
+                        f"⬇️ Download {export_fmt.upper()}",
+                        f,
+                        file_name=f"history_{export_start}_{export_end}{'_' + filename_part(export_nrp) if export_nrp else ''}.{export_fmt}",
+                        mime=EXPORT_MIME[export_fmt]
+                    )
+        else:
+            st.info("Pilih tanggal awal dan akhir.")
 
-            st.download_button(
-                "⬇️ Download CSV",
-                csv,
-                file_name=f"history_{selected}.csv",
-                mime="text/csv"
+        st.divider()
+
+        # =========================
+        # LAPORAN BULANAN (ARSIP)
+        # =========================
+        st.subheader("🗄️ Laporan Bulanan (Arsip)")
+
+        archive_months = get_archive_months()
+        if archive_months:
+            month = st.selectbox("Pilih bulan:", archive_months)
+            report = get_archive_monthly_report(month)
+            st.markdown(f"**{int(report['claims'].sum())} klaim** oleh {len(report)} karyawan")
+            st.dataframe(
+                report.rename(columns={'nrp': 'NRP', 'name': 'Nama Karyawan', 'claims': 'Jumlah Klaim',
+                                       'first_claim': 'Klaim Pertama', 'last_claim': 'Klaim Terakhir'}),
+                use_container_width=True,
+                hide_index=True
             )
+        else:
+            st.info("Arsip masih kosong (klaim diarsipkan setelah lewat 3 hari).")
+
+        st.divider()
+
+        # =========================
+        # ANALITIK (DARI TABEL ROLLUP)
+        # =========================
+        st.subheader("📊 Analitik Klaim")
+
+        if rollup_backfill_pending():
+            st.caption("Data arsip lama sedang dimasukkan ke rollup di latar belakang.")
 
+        analytics_day = st.date_input("Tanggal analitik:", value=date.today(),
+                                      max_value=date.today(), key="analytics_day")
+        day_stats = get_rollup_day(analytics_day.isoformat())
+
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Total Klaim", day_stats["claims"])
+        m2.metric("Sisa Kuota", max(DAILY_QUOTA - day_stats["claims"], 0))
+        if day_stats["peak_minute"]:
+            peak_time, peak_claims = day_stats["peak_minute"]
+            m3.metric("Menit Puncak", peak_time, f"{peak_claims} klaim/menit", delta_color="off")
         else:
-            st.info("Belum ada data pada 3 hari terakhir.") # Update pesan
+            m3.metric("Menit Puncak", "-")
+
+        if day_stats["claims"]:
+            st.markdown("**Klaim per Jam**")
+            st.bar_chart(day_stats["hourly"])
+            st.markdown("**Burn-down Kuota Harian**")
+            st.line_chart(day_stats["burn_down"])
+
+            # Perkiraan antrian counter dari jam klaim (satu counter, layanan tetap)
+            queue = queue_summary(load_claim_columns(analytics_day.isoformat(), analytics_day.isoformat()).epoch)
+            q1, q2, q3 = st.columns(3)
+            q1.metric("Antrian Maks. (perkiraan)", queue["max_queue"])
+            q2.metric("Rata-rata Tunggu", f"{queue['mean_wait']:.0f} dtk")
+            q3.metric("Tunggu p95", f"{queue['p95_wait']:.0f} dtk")
+        else:
+            st.info("Tidak ada klaim pada tanggal ini.")
+
+        rollup_months = get_rollup_months()
+        if rollup_months:
+            analytics_month = st.selectbox("Pemakaian per bulan:", rollup_months, key="analytics_month")
+            month_stats = get_rollup_month(analytics_month)
+            st.bar_chart(month_stats["daily"])
+            st.dataframe(month_stats["employees"], use_container_width=True, hide_index=True)
 
         st.divider()
 
@@ -798,56 +1173,136 @@ with tab2:
 
         up = st.file_uploader("Upload CSV: nrp, name, quota", type="csv")
         if up:
-            try:
-                dat = pd.read_csv(up)
-                conn = get_db_connection()
-                dat.to_sql("employees", conn, if_exists="append", index=False)
-                conn.commit() # Pastikan commit
-                st.success("Upload berhasil!")
-                # Invalidate cache setelah modifikasi
-                get_employee.clear()
-            except Exception as e:
-                st.error(f"Gagal upload: {e}")
+            # File yang sama tetap ada di uploader saat rerun: proses sekali per file
+            if st.session_state.get('import_file_id') != up.file_id:
+                try:
+                    st.session_state['import_report'] = import_employees_csv(up, up.name)
+                    st.session_state['import_file_id'] = up.file_id
+                except Exception as e:
+                    st.session_state['import_report'] = None
+                    st.error(f"Gagal upload: {e}")
+
+            report = st.session_state.get('import_report')
+            if report:
+                if report["duplicate_file"]:
+                    st.info("File ini sudah pernah diupload, tidak diproses ulang.")
+                st.success(
+                    f"Upload berhasil! Baru: {report['inserted']}, "
+                    f"diperbarui: {report['updated']}, ditolak: {report['rejected']}"
+                )
+                if report["rejects"]:
+                    st.dataframe(
+                        pd.DataFrame(report["rejects"], columns=["Baris", "NRP", "Alasan"]),
+                        use_container_width=True,
+                        hide_index=True
+                    )
 
         c1, c2 = st.columns(2)
 
         # 🟢 PERBAIKAN: LOGIKA UNCONDITIONAL RESET KUOTA MANUAL
         with c1:
             if st.button("Reset Kuota Manual"):
-                conn = get_db_connection()
-                # Ambil tanggal hari ini (waktu Jakarta) untuk update metadata
-                today_jakarta = datetime.now(ZoneInfo("Asia/Jakarta")).date().isoformat()
-                c = conn.cursor()
-                
                 # --- LOGIKA RESET MANUAL (UNCONDITIONAL) ---
-                st.info("Sedang memproses reset kuota secara manual...")
-                
-                # 1. Reset kuota semua karyawan menjadi 168 (Pastikan ini selalu dilakukan)
-                c.execute("UPDATE employees SET quota = 168")
-                # 2. Update metadata 'last_reset' menjadi tanggal hari ini 
-                c.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('last_reset', ?)", (today_jakarta,))
-                conn.commit()
-                
-                # 3. Clear semua cache yang relevan
-                get_employee.clear()
-                get_claim_today.clear()
-                get_all_claims.clear()
-                get_last_claim.clear() 
-                
+                # Epoch = waktu Jakarta sekarang (lebih baru dari epoch harian hari ini),
+                # sehingga semua kuota kembali 168 tanpa UPDATE tabel employees.
+                now_jakarta = datetime.now(ZoneInfo("Asia/Jakarta")).strftime("%Y-%m-%dT%H:%M:%S")
+                reset_quota(now_jakarta)
                 st.success("✅ Kuota telah direset secara manual!")
-                time.sleep(1.0) 
-                st.rerun() # <--- KUNCI: Memaksa Streamlit untuk memuat ulang data baru
 
         with c2:
             if st.button("Hapus Semua Klaim"):
-                conn = get_db_connection()
-                c = conn.cursor()
-                c.execute("DELETE FROM claims")
-                conn.commit()
+                with db_write() as conn:
+                    c = conn.cursor()
+                    c.execute("BEGIN IMMEDIATE")
+                    # Penghapusan manual (bukan retention) ikut membatalkan rollup
+                    subtract_claims_from_rollups(c)
+                    c.execute("DELETE FROM claims")
+                    conn.commit()
                 st.warning("Semua data klaim dihapus!")
                 # Invalidate cache setelah modifikasi
-                get_all_claims.clear()
-                get_last_claim.clear()
+                get_cache().invalidate_namespace("claim_today")
+
+        # =========================
+        # CEK COUNTER HARIAN
+        # =========================
+        if st.button("Periksa Counter Harian"):
+            mismatches = check_daily_counters()
+            if not mismatches:
+                st.success("✅ Counter harian sesuai dengan data klaim.")
+            st.session_state['counter_mismatches'] = mismatches
+
+        if st.session_state.get('counter_mismatches'):
+            st.warning("⚠️ Counter harian tidak sesuai dengan data klaim:")
+            st.dataframe(
+                pd.DataFrame(
+                    [(d, s[0], a[0], s[1], a[1]) for d, s, a in st.session_state['counter_mismatches']],
+                    columns=["Tanggal", "Klaim (counter)", "Klaim (aktual)",
+                             "Pengklaim (counter)", "Pengklaim (aktual)"],
+                ),
+                use_container_width=True,
+                hide_index=True
+            )
+            if st.button("Perbaiki Counter"):
+                check_daily_counters(repair=True)
+                st.session_state['counter_mismatches'] = []
+                get_cache().invalidate_namespace("daily_counter")
+                st.success("✅ Counter harian dihitung ulang dari data klaim.")
+
+        st.divider()
+
+        # =========================
+        # DIAGNOSTIK PERFORMA
+        # =========================
+        with st.expander("🩺 Diagnostik Performa"):
+            profiler = get_query_profiler()
+            st.markdown("**Rencana Query**")
+            plan_rows = pd.DataFrame(profiler.plan_rows())
+            unexpected = plan_rows[plan_rows["full_scan"] & ~plan_rows["disengaja"]]
+            if not unexpected.empty:
+                st.warning(f"⚠️ SCAN tabel penuh: {', '.join(unexpected['nama'])}")
+            off_plan = plan_rows[~plan_rows["sesuai_harapan"]]
+            if not off_plan.empty:
+                st.warning(f"⚠️ Rencana tidak sesuai harapan: {', '.join(off_plan['nama'])}")
+            st.dataframe(plan_rows, use_container_width=True, hide_index=True)
+            st.button("Periksa Ulang Rencana", on_click=profiler.recheck_plans)
+
+            st.markdown(f"**Query Lambat** (≥ {SLOW_QUERY_MS:g} ms)")
+            slow_rows = profiler.slow_rows()
+            if slow_rows:
+                st.dataframe(pd.DataFrame(slow_rows), use_container_width=True, hide_index=True)
+            else:
+                st.caption("Belum ada query yang melewati batas.")
+
+            if not METRICS_ENABLED:
+                st.info("Instrumentasi mati. Jalankan app dengan LUNCH_METRICS=1 untuk mengukur "
+                        "query, cache, dan waktu render per bagian.")
+            else:
+                metrics = get_metrics()
+                st.caption(f"Per proses, {METRICS_WINDOW} sampel terakhir per metrik.")
+                timing_rows = metrics.timing_rows()
+                if timing_rows:
+                    st.dataframe(pd.DataFrame(timing_rows).round(2), use_container_width=True, hide_index=True)
+
+                counters = pd.DataFrame(metrics.counter_rows(), columns=["jenis", "nama", "jumlah"])
+                cache_counts = counters[counters["jenis"].isin(["cache_hit", "cache_miss"])]
+                if not cache_counts.empty:
+                    cache_table = cache_counts.pivot_table(
+                        index="nama", columns="jenis", values="jumlah", fill_value=0
+                    ).reindex(columns=["cache_hit", "cache_miss"], fill_value=0).astype(int)
+                    cache_table["hit_%"] = (
+                        cache_table["cache_hit"] / cache_table.sum(axis=1) * 100
+                    ).round(1)
+                    st.markdown("**Cache**")
+                    st.dataframe(cache_table, use_container_width=True)
+                other_counts = counters[~counters["jenis"].isin(["cache_hit", "cache_miss"])]
+                if not other_counts.empty:
+                    st.dataframe(other_counts, use_container_width=True, hide_index=True)
+
+                st.download_button("⬇️ Metrik (format Prometheus)", metrics.prometheus_text(),
+                                   file_name="lunch_metrics.txt", mime="text/plain")
+                if METRICS_PORT:
+                    st.caption(f"Scrape lokal: http://127.0.0.1:{METRICS_PORT}/metrics")
+                st.button("Reset Metrik", on_click=metrics.reset)
 
 
     elif admin_pass:
@@ -858,7 +1313,7 @@ with tab2:
 # =========================
 # TAB 3 — BANTUAN
 # =========================
-with tab3:
+with tab3, timed("section", "tab_bantuan"):
     st.markdown("""
     <div class="card" style="padding:16px;text-align:center;">
         <h4 style="margin:0;color:#111827;font-weight:700;">Helmalya RP</h4>
@@ -889,154 +1344,8 @@ if st.session_state.get('claim_success', False):
     claimed_date_str = st.session_state.get('claimed_date_str', 'Tanggal Tidak Diketahui')
     claimed_time = st.session_state.get('claimed_time', 'Waktu Tidak Diketahui')
 
-    # CSS dan HTML untuk Modal Pop-up (Full Screen)
+    # HTML Modal Pop-up (CSS-nya ada di tema, lihat build_theme_css)
     modal_html = f"""
-    <style>
-        /* Animasi Icon Checklist (LEBIH CEPAT & MENCILOK) */
-        @keyframes iconScale {{
-            0% {{ transform: scale(0); opacity: 0; }}
-            80% {{ transform: scale(1.15); opacity: 1; }} /* Pantulan lebih besar */
-            100% {{ transform: scale(1); opacity: 1; }}
-        }}
-        
-        @keyframes pulse {{
-            0% {{ box-shadow: 0 0 0 0 rgba(255, 255, 255, 0.6); }} /* Lebih terang */
-            70% {{ box-shadow: 0 0 0 25px rgba(255, 255, 255, 0); }} /* Radius bayangan lebih besar */
-            100% {{ box-shadow: 0 0 0 0 rgba(255, 255, 255, 0); }}
-        }}
-        
-        /* Overlay Full Screen */
-        .full-screen-modal-overlay {{
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(0, 0, 0, 0.7);
-            backdrop-filter: blur(4px);
-            z-index: 9999; 
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            animation: fadeInOverlay 0.3s ease-out;
-            /* Anti-screenshot */
-            pointer-events: auto; 
-            user-select: none;
-            -webkit-user-select: none;
-            -moz-user-select: none;
-        }}
-
-        /* Elemen Animasi Anti-Screenshot (Blinking) */
-        .anti-screenshot-flicker {{
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(255, 255, 255, 0.01);
-            z-index: 10000; 
-            animation: flicker 0.2s infinite alternate; 
-            pointer-events: none;
-        }}
-
-        /* Keyframes untuk flicker */
-        @keyframes flicker {{
-            from {{ opacity: 0; }}
-            to {{ opacity: 0.1; }}
-        }}
-
-        /* Konten Modal (FULL SCREEN) */
-        .modal-content {{
-            background: linear-gradient(145deg, #28A745, #2ECC71); /* Gradien Hijau Sukses */
-            color: white;
-            border-radius: 20px;
-            padding: 50px 30px; 
-            max-width: 95%; 
-            width: 90%; 
-            height: 80vh; 
-            display: flex;
-            flex-direction: column;
-            justify-content: center; 
-            align-items: center;
-            text-align: center;
-            box-shadow: 0 15px 40px rgba(0, 0, 0, 0.4);
-            animation: popUp 0.4s cubic-bezier(0.68, -0.55, 0.265, 1.55);
-            z-index: 10001; 
-        }}
-        
-        /* Icon Centang */
-        .success-icon {{
-            color: white; 
-            font-size: 70px; 
-            margin-bottom: 30px; 
-            font-weight: 900;
-            line-height: 1;
-            border: 6px solid white; 
-            border-radius: 50%;
-            width: 120px; 
-            height: 120px; 
-            display: inline-flex;
-            justify-content: center;
-            align-items: center;
-            /* DURASI LEBIH CEPAT: iconScale 0.4s, pulse 1.2s, delay 0.4s */
-            animation: 
-                iconScale 0.4s cubic-bezier(0.68, -0.55, 0.265, 1.55) forwards, 
-                pulse 1.2s infinite 0.4s; 
-        }}
-
-        /* TEXT FONT SIZE INCREASE */
-        .modal-content h2 {{
-            color:white; 
-            margin-top:10px; 
-            font-weight:800; 
-            font-size:50px; /* Diperbesar dari 40px ke 50px */
-        }}
-        .modal-content p:nth-child(2) {{ /* Pesan Selamat Makan */
-            font-size:42px; /* Diperbesar dari 30px ke 42px */
-            font-weight:700; 
-            margin-bottom:15px; 
-            margin-top:10px;
-        }}
-        .modal-content p:nth-child(3), .modal-content p:nth-child(4) {{ /* Tanggal & Waktu Klaim */
-            font-size:28px; /* Diperbesar dari 20px ke 28px */
-            color:#F0F0F0; 
-            margin-top:0;
-        }}
-
-        /* Animasi Dasar Modal */
-        @keyframes fadeInOverlay {{ from {{ opacity: 0; }} to {{ opacity: 1; }} }}
-        @keyframes popUp {{
-            from {{ transform: scale(0.7); opacity: 0; }}
-            to {{ transform: scale(1); opacity: 1; }}
-        }}
-
-        /* Tombol Streamlit untuk nutup */
-        .stButton button[data-testid*="modal_streamlit_button"] {{
-            position: fixed; 
-            bottom: 10vh; 
-            left: 50%;
-            transform: translateX(-50%); 
-            width: 320px !important;
-            max-width: 80%;
-            z-index: 10002; 
-            margin: 0;
-            
-            /* Style tombol Streamlit */
-            background: linear-gradient(90deg, #FFD200, #FFE766);
-            color: black;
-            border: none;
-            padding: 18px 20px; 
-            border-radius: 10px;
-            font-size: 24px; /* Diperbesar dari 20px ke 24px */
-            font-weight: 700;
-            cursor: pointer;
-            box-shadow: 0 4px 12px rgba(255,210,32,0.3);
-            transition: transform 0.1s;
-        }}
-        .stButton button[data-testid*="modal_streamlit_button"]:hover {{
-            transform: translate(-50%, -1px);
-        }}
-    </style>
     <div class="full-screen-modal-overlay">
         <div class="anti-screenshot-flicker"></div> <div class="modal-content">
             <div class="success-icon">✓</div>
@@ -1051,10 +1360,8 @@ if st.session_state.get('claim_success', False):
     # Tampilkan HTML Modal
     st.markdown(modal_html, unsafe_allow_html=True)
 
-    # Tambahkan tombol Streamlit.
-    if st.button("Selesai", key="modal_streamlit_button"):
-        st.session_state['claim_success'] = False
-        st.rerun() 
+    # Callback menutup modal sebelum script jalan ulang: cukup satu rerun
+    st.button("Selesai", key="modal_streamlit_button", on_click=close_claim_modal)
             
 
 # =========================
@@ -1071,4 +1378,8 @@ st.markdown(f"""
 # END OF FILE — FINAL CHECK
 # =========================
 
-st.markdown("", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown("", unsafe_allow_html=True)
+
+# Total waktu satu rerun penuh (tidak termasuk rerun fragment live status)
+if METRICS_ENABLED:
+    get_metrics().observe("section", "script", time.perf_counter() - script_started)
\ No newline at end of file
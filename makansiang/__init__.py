@@ -0,0 +1 @@
+"""Logika data & klaim makan siang, terpisah dari UI Streamlit (lunch.py)."""
@@ -0,0 +1,324 @@
+"""Analitik klaim: tabel rollup, analisis numpy, dan snapshot dashboard admin.
+
+numpy, pandas dan Plotly di-import di dalam fungsi yang memakainya, jadi
+thread maintenance (backfill rollup) tidak ikut memuatnya.
+"""
+import json
+from contextlib import nullcontext
+from datetime import date
+from pathlib import Path
+
+from makansiang.archive import ARCHIVE_DB_NAME, archive_attached
+from makansiang.cache import get_cache, get_data_version, log_invalidation
+from makansiang.claims import get_daily_counter
+from makansiang.db import DAILY_QUOTA, db_read, db_write
+from makansiang.exports import EXPORT_CHUNK_ROWS
+from makansiang.metrics import timed
+from makansiang.migrations import ROLLUP_BACKFILL_SQL, ROLLUP_HOUR_SQL, ROLLUP_MINUTE_SQL
+from makansiang.resources import process_resource
+
+# =========================
+# KOLOM KLAIM + ANALISIS NUMPY
+# =========================
+# Tanggal + jam diubah SQLite menjadi detik epoch (jam dinding WIB, tanpa
+# zona) sehingga Python hanya menerima integer; NRP disimpan sebagai kode
+# kategori int32. Semua analisis di bawah bekerja pada array, tanpa loop.
+CLAIM_EPOCH_SQL = "CAST(strftime('%s', {date} || ' ' || {time}) AS INTEGER)"
+QUEUE_SERVICE_SECONDS = 15  # perkiraan waktu layanan per karyawan di counter
+SECONDS_PER_DAY = 86400
+
+class ClaimColumns:
+    """Klaim dalam bentuk kolom: epoch (int64, urut naik), nrp_code (int32), nrp_categories."""
+
+    __slots__ = ("epoch", "nrp_code", "nrp_categories")
+
+    def __init__(self, epoch, nrp_code, nrp_categories):
+        self.epoch = epoch
+        self.nrp_code = nrp_code
+        self.nrp_categories = nrp_categories
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def nrp(self):
+        """NRP per klaim (didekode dari kategori)."""
+        return self.nrp_categories[self.nrp_code]
+
+def load_claim_columns(start, end):
+    """Klaim tanggal start..end (arsip + claims) sebagai ClaimColumns, di-cache per data_version."""
+    import numpy as np
+
+    def load():
+        has_archive = Path(ARCHIVE_DB_NAME).exists()
+        epochs, nrps = [], []
+        with db_read() as conn, (archive_attached(conn, readonly=True) if has_archive else nullcontext()):
+            c = conn.cursor()
+            sources = (["archive.claims_archive"] if has_archive else []) + ["claims"]
+            for source in sources:
+                c.execute(f"""
+                    SELECT {CLAIM_EPOCH_SQL.format(date="claim_date", time="claim_time")}, nrp
+                    FROM {source}
+                    WHERE claim_date >= ? AND claim_date <= ? AND claim_time IS NOT NULL
+                    ORDER BY claim_date, claim_time
+                """, (start, end))
+                while True:
+                    rows = c.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    epoch, nrp = zip(*rows)
+                    epochs.append(np.fromiter(epoch, dtype=np.int64, count=len(rows)))
+                    nrps.extend(nrp)
+
+        epoch = np.concatenate(epochs) if epochs else np.empty(0, dtype=np.int64)
+        categories, codes = np.unique(np.array(nrps, dtype=str), return_inverse=True)
+        codes = codes.astype(np.int32)
+        # Arsip lebih tua dari claims, jadi biasanya sudah urut; sort hanya jika perlu
+        if len(epoch) > 1 and (np.diff(epoch) < 0).any():
+            order = np.argsort(epoch, kind="stable")
+            epoch, codes = epoch[order], codes[order]
+        return ClaimColumns(epoch, codes, categories)
+    return get_cache().get_or_load(("claim_columns", start, end), load, version=get_data_version())
+
+def per_minute_histogram(epoch):
+    """Jumlah klaim per menit-dalam-hari (1440 bin, indeks = menit sejak 00:00)."""
+    import numpy as np
+
+    return np.bincount((epoch % SECONDS_PER_DAY) // 60, minlength=24 * 60)
+
+def inter_arrival_times(epoch):
+    """Jeda (detik) antar klaim berurutan pada hari yang sama."""
+    import numpy as np
+
+    same_day = np.diff(epoch // SECONDS_PER_DAY) == 0
+    return np.diff(epoch)[same_day]
+
+def inter_arrival_histogram(epoch, bins=(0, 5, 10, 30, 60, 120, 300, 900, SECONDS_PER_DAY)):
+    """(jumlah, tepi bin) distribusi jeda antar kedatangan."""
+    import numpy as np
+
+    return np.histogram(inter_arrival_times(epoch), bins=bins)
+
+def departure_times(epoch, service=QUEUE_SERVICE_SECONDS):
+    """Waktu selesai dilayani, antrian FIFO satu counter dengan waktu layanan tetap.
+
+    d[i] = max(a[i], d[i-1]) + s  ekuivalen dengan
+    d[i] = s*(i+1) + max(a[j] - s*j untuk j <= i), yaitu satu maximum.accumulate.
+    """
+    import numpy as np
+
+    idx = np.arange(len(epoch), dtype=np.int64)
+    return np.maximum.accumulate(epoch - service * idx) + service * (idx + 1)
+
+def queue_length_curve(epoch, service=QUEUE_SERVICE_SECONDS):
+    """(waktu, panjang antrian) setelah setiap kedatangan/kepergian, termasuk yang sedang dilayani."""
+    import numpy as np
+
+    departures = departure_times(epoch, service)
+    # Dua deret yang sudah urut: sort stabil cukup menggabungkan (merge) keduanya.
+    # Kepergian di depan, sehingga pada detik yang sama dihitung sebelum kedatangan.
+    times = np.concatenate([departures, epoch])
+    steps = np.concatenate([np.full(len(departures), -1, dtype=np.int64), np.ones(len(epoch), dtype=np.int64)])
+    order = np.argsort(times, kind="stable")
+    return times[order], np.cumsum(steps[order])
+
+def queue_summary(epoch, service=QUEUE_SERVICE_SECONDS):
+    """Ringkasan simulasi antrian: panjang maksimum dan waktu tunggu (detik)."""
+    import numpy as np
+
+    if len(epoch) == 0:
+        return {"max_queue": 0, "mean_wait": 0.0, "p95_wait": 0.0}
+    departures = departure_times(epoch, service)
+    waits = departures - service - epoch
+    # Antrian terpanjang selalu tercapai tepat setelah sebuah kedatangan
+    lengths = np.arange(1, len(epoch) + 1) - np.searchsorted(departures, epoch, side="right")
+    return {
+        "max_queue": int(lengths.max()),
+        "mean_wait": float(waits.mean()),
+        "p95_wait": float(np.percentile(waits, 95)),
+    }
+
+
+
+# =========================
+# ROLLUP ANALITIK
+# =========================
+# Tabel rollup_* diisi trigger saat klaim masuk (migrasi 7), jadi grafik
+# analitik tidak pernah membaca claims / arsip mentah.
+
+def backfill_rollups_from_archive():
+    """Masukkan klaim arsip lama (sebelum ada rollup) ke tabel rollup, sekali saja."""
+    with db_write() as conn:
+        c = conn.cursor()
+        c.execute("SELECT value FROM metadata WHERE key = 'rollup_archive_upto'")
+        row = c.fetchone()
+        if row is None:
+            return False
+        done = (
+            "DROP TABLE IF EXISTS rollup_backfill_seen",
+            "DELETE FROM metadata WHERE key = 'rollup_archive_upto'",
+        )
+        if not Path(ARCHIVE_DB_NAME).exists():
+            c.execute("BEGIN IMMEDIATE")
+            for sql in done:
+                c.execute(sql)
+            conn.commit()
+            return False
+        with archive_attached(conn):
+            c.execute("BEGIN IMMEDIATE")
+            where = "claim_id <= :upto AND claim_id NOT IN (SELECT id FROM main.rollup_backfill_seen)"
+            for sql in ROLLUP_BACKFILL_SQL:
+                c.execute(
+                    sql.format(source="archive.claims_archive", where=where),
+                    {"upto": int(row[0])},
+                )
+            for sql in done:
+                c.execute(sql)
+            for namespace in ("rollup_day", "rollup_month", "rollup_months"):
+                log_invalidation(c, namespace)
+            conn.commit()
+    get_cache().invalidate_namespace("rollup_day", "rollup_month", "rollup_months")
+    return True
+
+def rollup_backfill_pending():
+    with db_read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM metadata WHERE key = 'rollup_archive_upto'")
+        return c.fetchone() is not None
+
+def subtract_claims_from_rollups(c):
+    """Kurangi rollup dengan isi tabel claims saat ini (dipakai sebelum hapus semua klaim)."""
+    c.execute('''
+        UPDATE rollup_daily SET claims = rollup_daily.claims - d.n, claimants = rollup_daily.claimants - d.n
+        FROM (SELECT claim_date, COUNT(*) AS n FROM claims GROUP BY claim_date) AS d
+        WHERE rollup_daily.claim_date = d.claim_date
+    ''')
+    c.execute(f'''
+        UPDATE rollup_hourly SET claims = rollup_hourly.claims - d.n
+        FROM (SELECT claim_date, {ROLLUP_HOUR_SQL.format(col="claim_time")} AS h, COUNT(*) AS n
+              FROM claims WHERE claim_time IS NOT NULL GROUP BY claim_date, h) AS d
+        WHERE rollup_hourly.claim_date = d.claim_date AND rollup_hourly.hour = d.h
+    ''')
+    c.execute(f'''
+        UPDATE rollup_minute SET claims = rollup_minute.claims - d.n
+        FROM (SELECT claim_date, {ROLLUP_MINUTE_SQL.format(col="claim_time")} AS m, COUNT(*) AS n
+              FROM claims WHERE claim_time IS NOT NULL GROUP BY claim_date, m) AS d
+        WHERE rollup_minute.claim_date = d.claim_date AND rollup_minute.minute = d.m
+    ''')
+    c.execute('''
+        UPDATE rollup_employee_monthly SET claims = rollup_employee_monthly.claims - d.n
+        FROM (SELECT substr(claim_date, 1, 7) AS mon, nrp, COUNT(*) AS n
+              FROM claims GROUP BY mon, nrp) AS d
+        WHERE rollup_employee_monthly.month = d.mon AND rollup_employee_monthly.nrp = d.nrp
+    ''')
+    for table in ("rollup_daily", "rollup_hourly", "rollup_minute", "rollup_employee_monthly"):
+        c.execute(f"DELETE FROM {table} WHERE claims <= 0")
+
+def format_minute(minute):
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+def get_rollup_day(claim_date):
+    """Analitik satu hari: klaim per jam, per menit, menit puncak dan burn-down kuota."""
+    def load():
+        import pandas as pd
+
+        with db_read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT claims, claimants FROM rollup_daily WHERE claim_date = ?", (claim_date,))
+            total, claimants = c.fetchone() or (0, 0)
+            c.execute("SELECT hour, claims FROM rollup_hourly WHERE claim_date = ? ORDER BY hour", (claim_date,))
+            hourly = c.fetchall()
+            c.execute("SELECT minute, claims FROM rollup_minute WHERE claim_date = ? ORDER BY minute", (claim_date,))
+            minutes = c.fetchall()
+
+        peak = max(minutes, key=lambda r: r[1]) if minutes else None
+        # Sisa kupon harian setelah setiap menit yang ada klaimnya
+        burn_down, used = [], 0
+        for minute, claims in minutes:
+            used += claims
+            burn_down.append((format_minute(minute), DAILY_QUOTA - used))
+        return {
+            "claims": total,
+            "claimants": claimants,
+            "hourly": pd.DataFrame(
+                [(f"{h:02d}:00", n) for h, n in hourly], columns=["Jam", "Klaim"]
+            ).set_index("Jam"),
+            "peak_minute": (format_minute(peak[0]), peak[1]) if peak else None,
+            "burn_down": pd.DataFrame(burn_down, columns=["Waktu", "Sisa Kuota"]).set_index("Waktu"),
+        }
+    return get_cache().get_or_load(("rollup_day", claim_date), load, version=get_data_version())
+
+def get_rollup_months():
+    """Daftar bulan (YYYY-MM) yang punya data rollup, terbaru dulu."""
+    def load():
+        with db_read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT DISTINCT substr(claim_date, 1, 7) FROM rollup_daily ORDER BY 1 DESC")
+            return [row[0] for row in c.fetchall()]
+    return get_cache().get_or_load(("rollup_months",), load, version=get_data_version())
+
+def get_rollup_month(month):
+    """Rekap satu bulan: total klaim per hari dan pemakaian per karyawan."""
+    start = f"{month}-01"
+    end = f"{month}-32"
+    def load():
+        import pandas as pd
+
+        with db_read() as conn:
+            daily = pd.read_sql_query('''
+                SELECT claim_date AS Tanggal, claims AS Klaim FROM rollup_daily
+                WHERE claim_date >= ? AND claim_date < ? ORDER BY claim_date
+            ''', conn, params=(start, end)).set_index("Tanggal")
+            employees = pd.read_sql_query('''
+                SELECT r.nrp AS NRP, e.name AS "Nama Karyawan", r.claims AS "Jumlah Klaim"
+                FROM rollup_employee_monthly r
+                LEFT JOIN employees e ON e.nrp = r.nrp
+                WHERE r.month = ?
+                ORDER BY r.claims DESC, r.nrp
+            ''', conn, params=(month,))
+        return {"daily": daily, "employees": employees}
+    return get_cache().get_or_load(("rollup_month", month), load, version=get_data_version())
+
+
+# =========================
+# SNAPSHOT DASHBOARD ADMIN
+# =========================
+# Angka kartu + figure pie di-cache per nilai yang ditampilkan (klaim,
+# pengklaim, kuota hari ini), bukan per data_version: perubahan karyawan atau
+# tanggal lain tidak membangunnya ulang. Figure = template dict (px.pie
+# dibangun sekali per proses) yang hanya ditambal angkanya, jadi cache miss
+# saat jam makan siang tidak memanggil Plotly dan tidak menulis ke database.
+DASHBOARD_LABELS = ["Sudah Klaim", "Belum Klaim"]
+
+@process_resource
+def _dashboard_pie_template():
+    """Figure pie (dict JSON) dengan nilai kosong, untuk ditambal angka hari ini."""
+    import plotly.express as px
+
+    fig = px.pie(names=DASHBOARD_LABELS, values=[0, 0], hole=0.45)
+    fig.update_traces(textinfo='percent+label')
+    return json.loads(fig.to_json())
+
+@timed("build", "dashboard_snapshot")
+def _build_dashboard_snapshot(today, used, claimants):
+    not_claimed = max(DAILY_QUOTA - used, 0)
+    template = _dashboard_pie_template()
+    pie = {**template["data"][0], "values": [used, not_claimed]}
+    return {
+        "date": today,
+        "quota": DAILY_QUOTA,
+        "today_used": used,
+        "claimants": claimants,
+        "not_claimed": not_claimed,
+        # Layout dipakai bersama (hanya dibaca); trace baru per snapshot
+        "figure": {**template, "data": [pie]},
+    }
+
+def get_dashboard_snapshot():
+    """Snapshot dashboard admin untuk hari ini, dibangun ulang hanya saat angkanya berubah."""
+    today = date.today().isoformat()
+    used, claimants = get_daily_counter(today)
+    return get_cache().get_or_load(
+        ("dashboard", today),
+        lambda: _build_dashboard_snapshot(today, used, claimants),
+        version=(used, claimants, DAILY_QUOTA),
+    )
@@ -0,0 +1,113 @@
+"""Arsip klaim lama (database terpisah) dan laporan bulanan dari arsip.
+
+pandas hanya di-import di dalam fungsi yang mengembalikan DataFrame.
+"""
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+from makansiang.db import DB_NAME, db_read, db_write
+
+# =========================
+# ARSIP KLAIM > 3 HARI
+# =========================
+# Tabel claims hanya menyimpan 3 hari terakhir. Klaim yang lebih lama
+# dipindah ke database arsip terpisah (append-only) sebelum dihapus.
+# Default di folder yang sama dengan DB_NAME; bisa di-override lewat LUNCH_ARCHIVE_DB
+ARCHIVE_DB_NAME = os.environ.get("LUNCH_ARCHIVE_DB", str(Path(DB_NAME).with_name("lunch_archive.db")))
+RETENTION_DAYS = 3
+ARCHIVE_BATCH_SIZE = 5000
+
+@contextmanager
+def archive_attached(conn, readonly=False):
+    """ATTACH database arsip sebagai skema `archive` selama blok `with`."""
+    path = Path(ARCHIVE_DB_NAME).resolve()
+    if readonly:
+        conn.execute("ATTACH DATABASE ? AS archive", (path.as_uri() + "?mode=ro",))
+    else:
+        conn.execute("ATTACH DATABASE ? AS archive", (str(path),))
+    try:
+        if not readonly:
+            # Diurutkan per tanggal (WITHOUT ROWID) agar laporan per bulan
+            # cukup membaca halaman yang berurutan
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS archive.claims_archive (
+                    claim_date TEXT NOT NULL,
+                    nrp TEXT NOT NULL,
+                    claim_time TEXT,
+                    name TEXT,
+                    claim_id INTEGER NOT NULL,
+                    PRIMARY KEY (claim_date, nrp)
+                ) WITHOUT ROWID
+            ''')
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("DETACH DATABASE archive")
+
+def cleanup_old_claims():
+    """Arsipkan lalu hapus klaim yang lebih dari 3 hari, per batch.
+
+    Salin ke arsip dan hapus dari claims dilakukan di dua commit terpisah
+    (WAL tidak menjamin atomik antar database). Jika proses mati di tengah,
+    putaran berikutnya aman mengulang karena INSERT OR IGNORE.
+    """
+    # Batas hapus 3 hari
+    limit = (date.today() - timedelta(days=RETENTION_DAYS)).isoformat()
+    moved = 0
+    with db_write() as conn, archive_attached(conn):
+        c = conn.cursor()
+        while True:
+            c.execute('''
+                SELECT MAX(id) FROM (
+                    SELECT id FROM claims WHERE claim_date < ? ORDER BY id LIMIT ?
+                )
+            ''', (limit, ARCHIVE_BATCH_SIZE))
+            upper = c.fetchone()[0]
+            if upper is None:
+                break
+
+            c.execute('''
+                INSERT OR IGNORE INTO archive.claims_archive
+                    (claim_date, nrp, claim_time, name, claim_id)
+                SELECT c.claim_date, c.nrp, c.claim_time, e.name, c.id
+                FROM claims c
+                LEFT JOIN employees e ON e.nrp = c.nrp
+                WHERE c.claim_date < ? AND c.id <= ?
+            ''', (limit, upper))
+            conn.commit()
+
+            c.execute("DELETE FROM claims WHERE claim_date < ? AND id <= ?", (limit, upper))
+            moved += c.rowcount
+            conn.commit()
+    return moved
+
+def get_archive_months():
+    """Daftar bulan (YYYY-MM) yang ada di arsip, terbaru dulu."""
+    if not Path(ARCHIVE_DB_NAME).exists():
+        return []
+    with db_read() as conn, archive_attached(conn, readonly=True):
+        c = conn.cursor()
+        c.execute('''
+            SELECT DISTINCT substr(claim_date, 1, 7) FROM archive.claims_archive
+            ORDER BY 1 DESC
+        ''')
+        return [row[0] for row in c.fetchall()]
+
+def get_archive_monthly_report(month):
+    """Rekap klaim per karyawan untuk satu bulan (YYYY-MM) dari arsip."""
+    start = f"{month}-01"
+    end = f"{month}-32"  # batas atas string, cukup untuk semua tanggal di bulan itu
+    import pandas as pd
+
+    with db_read() as conn, archive_attached(conn, readonly=True):
+        return pd.read_sql_query('''
+            SELECT nrp, MAX(name) AS name, COUNT(*) AS claims,
+                   MIN(claim_date) AS first_claim, MAX(claim_date) AS last_claim
+            FROM archive.claims_archive
+            WHERE claim_date >= ? AND claim_date < ?
+            GROUP BY nrp
+            ORDER BY claims DESC, nrp
+        ''', conn, params=(start, end))
@@ -0,0 +1,179 @@
+"""Cache per proses dengan invalidasi per key, disinkronkan antar proses lewat SQLite."""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from makansiang.db import db_read, db_write
+from makansiang.metrics import count
+from makansiang.queries import run_query
+from makansiang.resources import process_resource
+
+# =========================
+# KEYED CACHE (INVALIDASI PER KEY)
+# =========================
+CACHE_MAX_ENTRIES = 20000
+
+class KeyedCache:
+    """Cache in-process dengan key tuple, mis. ("employee", nrp).
+
+    Entry per-NRP dibuang eksplisit saat NRP itu berubah; entry agregat
+    disimpan bersama data_version dan otomatis basi saat versi naik.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        # Naik setiap invalidasi; hasil load yang "balapan" dengan invalidasi tidak disimpan
+        self._generation = 0
+        # Posisi replay log cache_invalidations (lihat sync_cache)
+        self.log_seq = None
+        self.synced_version = None
+        self.sync_lock = threading.Lock()
+
+    def get_or_load(self, key, loader, version=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(key)
+                count("cache_hit", key[0])
+                return entry[1]
+            generation = self._generation
+        count("cache_miss", key[0])
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._data[key] = (version, value)
+                self._data.move_to_end(key)
+                while len(self._data) > self._max_entries:
+                    self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate_namespace(self, *namespaces):
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._data if k[0] in namespaces]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+@process_resource
+def get_cache():
+    """Satu KeyedCache per proses, dipakai bersama semua sesi."""
+    return KeyedCache()
+
+def get_data_version():
+    """Versi data saat ini (naik lewat trigger setiap claims/employees berubah)."""
+    with db_read() as conn:
+        row = run_query(conn, "data_version", fetch="one")
+    return int(row[0]) if row else 0
+
+def invalidate_claim(nrp, claim_date):
+    """Buang cache milik satu NRP + agregat tanggal itu, entry NRP lain tetap."""
+    get_cache().invalidate(
+        ("employee", nrp, claim_date),
+        ("claim_today", nrp, claim_date),
+        ("daily_counter", claim_date),
+        ("last_claim",),
+    )
+
+
+# =========================
+# CACHE LINTAS PROSES
+# =========================
+# Beberapa proses app (di belakang reverse proxy) punya KeyedCache sendiri.
+# Trigger (migrasi 8) menulis setiap perubahan per NRP ke cache_invalidations;
+# tiap proses memutar ulang log itu saat data_version berubah, sekali di awal
+# setiap rerun (dan tiap refresh live status). Entry ber-version sudah basi
+# sendiri; yang perlu log adalah entry per NRP tanpa version.
+CACHE_LOG_RETENTION = 3600  # detik; proses yang tertinggal lebih jauh mengosongkan cache
+CACHE_SYNC_WAIT = 2.0       # detik menunggu sync sesi lain sebelum entry per NRP dibuang
+# Namespace per NRP tanpa version: hanya log invalidasi yang membuatnya segar
+UNVERSIONED_NAMESPACES = ("employee", "claim_today")
+
+def log_invalidation(conn, namespace, nrp=None, claim_date=None):
+    """Catat invalidasi untuk proses lain, di transaksi `conn` (nrp None = seluruh namespace)."""
+    run_query(conn, "log_invalidation", (namespace, nrp, claim_date))
+
+def sync_cache():
+    """Terapkan invalidasi dari proses lain ke KeyedCache proses ini."""
+    cache = get_cache()
+    version = get_data_version()
+    if version == cache.synced_version:
+        return
+    # Sesi lain sedang sync: tunggu hasilnya, jangan jalan dengan entry basi
+    if not cache.sync_lock.acquire(timeout=CACHE_SYNC_WAIT):
+        # Sync macet (mis. menunggu lock database): rerun ini membaca per-NRP
+        # langsung dari database daripada memakai entry yang mungkin basi
+        cache.invalidate_namespace(*UNVERSIONED_NAMESPACES)
+        count("cache_sync", "wait_timeout")
+        return
+    try:
+        if version == cache.synced_version:
+            return  # sudah di-sync oleh sesi yang ditunggu
+        with db_read() as conn:
+            if cache.log_seq is None:
+                # Proses baru: cache masih kosong, cukup mulai dari ujung log
+                cache.log_seq = run_query(conn, "cache_log_head", fetch="one")[0]
+                cache.synced_version = version
+                return
+            floor = run_query(conn, "cache_log_floor", fetch="one")
+            rows = run_query(conn, "cache_log_since", (cache.log_seq,), fetch="all")
+        if floor and int(floor[0]) > cache.log_seq:
+            # Log yang belum diputar sudah di-prune: tidak bisa tahu key mana yang basi
+            cache.clear()
+        else:
+            _replay_invalidations(cache, rows)
+        if rows:
+            cache.log_seq = rows[-1][0]
+        cache.synced_version = version
+        count("cache_sync", "replayed", len(rows))
+    finally:
+        cache.sync_lock.release()
+
+def _replay_invalidations(cache, rows):
+    today = date.today().isoformat()
+    keys, namespaces = [], set()
+    for _, namespace, nrp, claim_date in rows:
+        if nrp is None:
+            namespaces.add(namespace)
+        elif namespace == "claim_today":
+            keys += [
+                ("employee", nrp, claim_date),
+                ("claim_today", nrp, claim_date),
+                ("daily_counter", claim_date),
+                ("last_claim",),
+            ]
+        else:
+            keys.append((namespace, nrp, today))
+    if keys:
+        cache.invalidate(*keys)
+    if namespaces:
+        cache.invalidate_namespace(*namespaces)
+
+def prune_cache_log(now):
+    """Buang log invalidasi yang lebih tua dari CACHE_LOG_RETENTION."""
+    with db_write() as conn:
+        c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        c.execute(
+            "SELECT MAX(seq) FROM cache_invalidations WHERE created < ?",
+            (int(now - CACHE_LOG_RETENTION),),
+        )
+        floor = c.fetchone()[0]
+        if floor is not None:
+            c.execute("DELETE FROM cache_invalidations WHERE seq <= ?", (floor,))
+            c.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('cache_log_floor', ?)",
+                (str(floor),),
+            )
+        conn.commit()
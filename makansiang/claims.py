@@ -0,0 +1,294 @@
+"""Logika klaim: reset kuota, lookup karyawan/klaim, history, dan writer klaim.
+
+Hanya butuh stdlib + SQLite, jadi aman di-import di jalur karyawan/kiosk.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, datetime
+from enum import Enum
+from zoneinfo import ZoneInfo
+
+from makansiang.cache import get_cache, get_data_version, invalidate_claim
+from makansiang.db import DB_NAME, connect_sqlite, db_read, db_write, get_db_pools
+from makansiang.metrics import count, timed
+from makansiang.queries import run_query
+from makansiang.resources import process_resource
+
+logger = logging.getLogger(__name__)
+
+# =================================================================
+# RESET KUOTA HARIAN BERBASIS EPOCH
+# =================================================================
+# Kuota efektif dihitung di SQL (EFFECTIVE_QUOTA_SQL, makansiang.queries);
+# reset = memajukan metadata.quota_epoch, tanpa UPDATE tabel employees.
+def reset_quota(epoch):
+    """Reset kuota semua karyawan = satu write ke metadata.quota_epoch.
+
+    Epoch hanya boleh maju (string ISO, tanggal < tanggal+jam), jadi aman
+    dipanggil berulang kali. Mengembalikan True jika epoch berubah.
+    """
+    with db_write() as conn:
+        changed = run_query(conn, "advance_quota_epoch", (epoch,)).rowcount == 1
+        if changed:
+            run_query(conn, "bump_data_version")
+        conn.commit()
+    if changed:
+        get_cache().invalidate_namespace("employee")
+    return changed
+
+def auto_reset_daily():
+    """Majukan epoch ke hari ini bila belum (dipanggil thread maintenance)."""
+    # Menggunakan Asia/Jakarta untuk memastikan reset tepat pukul 00.00 WIB
+    today = datetime.now(ZoneInfo("Asia/Jakarta")).date().isoformat()
+    with db_read() as conn:
+        row = run_query(conn, "quota_epoch", fetch="one")
+    if not row or row[0] < today:
+        reset_quota(today)
+
+
+# =========================
+# HELPERS (MENGGUNAKAN CACHING)
+# =========================
+def get_employee(nrp):
+    today = date.today().isoformat()
+    def load():
+        with db_read() as conn:
+            # Kolom quota = sisa kuota efektif untuk epoch saat ini
+            return run_query(conn, "employee", (today, nrp), fetch="one")
+    return get_cache().get_or_load(("employee", nrp, today), load)
+
+def get_claim_today(nrp):
+    today = date.today().isoformat()
+    def load():
+        with db_read() as conn:
+            return run_query(conn, "claim_today", (nrp, today), fetch="one")
+    return get_cache().get_or_load(("claim_today", nrp, today), load)
+
+def get_daily_counter(claim_date):
+    """(jumlah klaim, jumlah pengklaim) untuk satu tanggal dari daily_counters."""
+    def load():
+        with db_read() as conn:
+            row = run_query(conn, "daily_counter", (claim_date,), fetch="one")
+        return row if row else (0, 0)
+    return get_cache().get_or_load(("daily_counter", claim_date), load, version=get_data_version())
+
+# 🟢 FUNGSI BARU: Live Feed Klaim Terakhir
+def get_last_claim():
+    # Mengambil klaim terakhir dengan nama karyawan
+    def load():
+        with db_read() as conn:
+            row = run_query(conn, "last_claim", fetch="one")
+        if row:
+            # Mengembalikan string yang diformat: "Nama (Waktu)"
+            return f"Terakhir Klaim: {row[1]} ({row[0]})"
+        return "Belum ada klaim hari ini."
+    # Ikut data_version: langsung segar setelah klaim dari sesi mana pun
+    return get_cache().get_or_load(("last_claim",), load, version=get_data_version())
+
+
+# =========================
+# HISTORY KLAIM (PAGINASI KEYSET)
+# =========================
+HISTORY_PAGE_SIZE = 50
+
+def get_history_day_counts(since):
+    """[(tanggal, jumlah klaim)] sejak `since`, terbaru dulu (dari daily_counters)."""
+    def load():
+        with db_read() as conn:
+            return run_query(conn, "history_day_counts", (since,), fetch="all")
+    return get_cache().get_or_load(("history_days", since), load, version=get_data_version())
+
+def get_history_page(since, until, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """Satu halaman history klaim, urut (claim_date, claim_time, id) menurun.
+
+    `cursor` = (claim_date, claim_time, id) baris terakhir halaman sebelumnya.
+    Mengembalikan list (id, nrp, name, claim_date, claim_time); hanya baris
+    halaman ini yang dibaca, memakai index ix_claims_date_time.
+    """
+    name = "history_page" if cursor is None else "history_page_after"
+    params = (since, until, limit, *(cursor or ()))
+
+    def load():
+        with db_read() as conn:
+            return run_query(conn, name, params, fetch="all")
+    key = ("history_page", since, until, tuple(cursor) if cursor else None, limit)
+    return get_cache().get_or_load(key, load, version=get_data_version())
+
+
+# =========================
+# CEK KONSISTENSI COUNTER HARIAN
+# =========================
+def check_daily_counters(repair=False):
+    """Bandingkan daily_counters dengan hitungan ulang dari claims.
+
+    Mengembalikan list (tanggal, tersimpan, seharusnya); jika repair=True
+    counter ditulis ulang dari claims dalam satu transaksi.
+    """
+    actual_sql = """
+        SELECT claim_date, COUNT(*), COUNT(DISTINCT nrp) FROM claims GROUP BY claim_date
+    """
+    with db_write() if repair else db_read() as conn:
+        c = conn.cursor()
+        if repair:
+            c.execute("BEGIN IMMEDIATE")
+        c.execute(actual_sql)
+        actual = {row[0]: (row[1], row[2]) for row in c.fetchall()}
+        c.execute("SELECT claim_date, claims, claimants FROM daily_counters")
+        stored = {row[0]: (row[1], row[2]) for row in c.fetchall()}
+
+        mismatches = [
+            (d, stored.get(d, (0, 0)), actual.get(d, (0, 0)))
+            for d in sorted(set(actual) | set(stored))
+            if stored.get(d, (0, 0)) != actual.get(d, (0, 0))
+        ]
+        if repair and mismatches:
+            c.execute("DELETE FROM daily_counters")
+            c.execute("INSERT INTO daily_counters (claim_date, claims, claimants) " + actual_sql)
+            c.execute("UPDATE metadata SET value = value + 1 WHERE key = 'data_version'")
+        conn.commit()
+    return mismatches
+
+
+# Fungsi yang memodifikasi DB (tidak boleh di-cache)
+def add_employee(nrp, name):
+    with db_write() as conn:
+        run_query(conn, "add_employee", (nrp, name))
+        conn.commit()
+    # Mutation: Invalidate cache NRP ini saja
+    get_cache().invalidate(("employee", nrp, date.today().isoformat()))
+
+
+# =========================
+# CLAIM ENGINE (ATOMIK)
+# =========================
+class ClaimResult(Enum):
+    """Hasil satu percobaan klaim makan siang."""
+    CLAIMED = "claimed"
+    ALREADY_CLAIMED = "already_claimed"
+    QUOTA_EXHAUSTED = "quota_exhausted"
+    UNKNOWN_EMPLOYEE = "unknown_employee"
+    FAILED = "failed"  # timeout / error database; aman dicoba lagi
+
+def _claim_outcome(c, nrp, claim_date):
+    """Cari alasan INSERT klaim "claim_insert" ditolak (hanya dipanggil di jalur gagal)."""
+    if run_query(c, "claim_exists", (nrp, claim_date), fetch="one"):
+        return ClaimResult.ALREADY_CLAIMED
+    if run_query(c, "employee_exists", (nrp,), fetch="one"):
+        return ClaimResult.QUOTA_EXHAUSTED
+    return ClaimResult.UNKNOWN_EMPLOYEE
+
+
+# =========================
+# WRITER THREAD (GROUP COMMIT)
+# =========================
+CLAIM_BATCH_WINDOW = 0.003  # detik menunggu klaim lain sebelum commit
+CLAIM_BATCH_MAX = 128
+CLAIM_TIMEOUT = 10          # detik maksimal sesi menunggu hasil klaim
+
+class ClaimWriter:
+    """Satu thread penulis yang menggabungkan klaim antrean ke satu transaksi.
+
+    Setiap klaim tetap dijalankan di SAVEPOINT sendiri, jadi hasil (dan error)
+    per klaim tidak tercampur; yang digabung hanya COMMIT/fsync-nya.
+    """
+
+    def __init__(self, path):
+        self._queue = queue.Queue()
+        # Koneksi khusus thread ini, transaksi dikelola manual
+        self._conn = connect_sqlite(path, isolation_level=None)
+        self._thread = threading.Thread(target=self._run, name="claim-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, nrp, claim_date, claim_time):
+        """Masukkan klaim ke antrean; hasilnya berupa Future[ClaimResult]."""
+        future = Future()
+        self._queue.put((nrp, claim_date, claim_time, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + CLAIM_BATCH_WINDOW
+            while len(batch) < CLAIM_BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with timed("db", "claim_batch"):
+                    self._commit_batch(batch)
+            except Exception as e:
+                # Thread penulis harus tetap hidup: cukup batch ini yang gagal
+                logger.exception("Batch klaim gagal")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            count("claim", "batched", len(batch))
+
+    def _commit_batch(self, batch):
+        c = self._conn.cursor()
+        outcomes = []
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            for nrp, claim_date, claim_time, future in batch:
+                c.execute("SAVEPOINT claim")
+                try:
+                    run_query(c, "claim_insert", (claim_date, claim_time, nrp))
+                    if c.rowcount == 1:
+                        result = ClaimResult.CLAIMED
+                    else:
+                        result = _claim_outcome(c, nrp, claim_date)
+                    c.execute("RELEASE claim")
+                    outcomes.append((future, result, None))
+                except sqlite3.Error as e:
+                    c.execute("ROLLBACK TO claim")
+                    c.execute("RELEASE claim")
+                    outcomes.append((future, None, e))
+            c.execute("COMMIT")
+        except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+
+        # Hasil baru dikirim setelah COMMIT, jadi "CLAIMED" berarti sudah tersimpan
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+@process_resource
+def get_claim_writer():
+    """Satu ClaimWriter per proses."""
+    get_db_pools()  # pastikan skema sudah ada
+    return ClaimWriter(DB_NAME)
+
+def add_claim(nrp):
+    """Klaim makan siang lewat writer thread. Mengembalikan ClaimResult.
+
+    Timeout atau error apa pun dari writer menjadi ClaimResult.FAILED, bukan
+    exception: klaim yang ternyata tetap masuk terbaca ALREADY_CLAIMED saat dicoba lagi.
+    """
+    today = date.today().isoformat()
+    now_time = datetime.now(ZoneInfo("Asia/Jakarta")).strftime("%H:%M:%S")
+
+    with timed("claim", "submit"):
+        future = get_claim_writer().submit(nrp, today, now_time)
+        try:
+            result = future.result(timeout=CLAIM_TIMEOUT)
+        except Exception:
+            logger.exception("Klaim NRP %s gagal diproses", nrp)
+            result = ClaimResult.FAILED
+    count("claim", result.name.lower())
+    # Hanya entry NRP ini (dan agregat hari ini) yang dibuang
+    invalidate_claim(nrp, today)
+    return result
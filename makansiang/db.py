@@ -0,0 +1,146 @@
+"""Koneksi & pool SQLite (satu pool tulis + satu pool baca-saja per proses)."""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from makansiang.metrics import timed
+from makansiang.migrations import run_migrations
+from makansiang.resources import process_resource
+
+# =========================
+# DATABASE SETUP & CACHING
+# =========================
+# LUNCH_DB bisa diarahkan ke file lain (mis. database sementara untuk benchmark)
+DB_NAME = os.environ.get("LUNCH_DB", "lunch.db")
+DAILY_QUOTA = 168
+
+# Ukuran pool: penulis sedikit (SQLite hanya punya satu writer),
+# pembaca lebih banyak karena WAL membolehkan baca paralel.
+DB_WRITE_POOL_SIZE = 4
+DB_READ_POOL_SIZE = 8
+DB_POOL_TIMEOUT = 10  # detik menunggu koneksi bebas
+
+# Pragma per koneksi (journal_mode=WAL disimpan di file DB, cukup sekali)
+SQLITE_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",     # ~16 MB page cache
+    "PRAGMA mmap_size = 268435456",   # 256 MB
+    "PRAGMA temp_store = MEMORY",
+)
+
+def connect_sqlite(path, readonly=False, isolation_level=""):
+    """Buka koneksi SQLite dengan pragma standar aplikasi."""
+    if readonly:
+        uri = Path(path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               isolation_level=isolation_level)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False,
+                               isolation_level=isolation_level)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+class SQLitePool:
+    """Pool koneksi SQLite terbatas; koneksi dipinjam per operasi lalu dikembalikan."""
+
+    def __init__(self, path, size, readonly=False):
+        self.path = path
+        self.size = size
+        self.readonly = readonly
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        return connect_sqlite(self.path, readonly=self.readonly)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Pool koneksi database penuh") from None
+
+    @contextmanager
+    def connection(self):
+        kind = "read" if self.readonly else "write"
+        with timed("db_wait", kind):
+            conn = self._acquire()
+        try:
+            with timed("db", kind):
+                yield conn
+        finally:
+            # Jangan kembalikan koneksi dengan transaksi yang masih terbuka
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+# Pool (dan init_db) hanya dibuat sekali per proses
+@process_resource
+def get_db_pools():
+    """Mengembalikan pasangan pool (tulis, baca-saja) yang di-cache."""
+    writer = SQLitePool(DB_NAME, DB_WRITE_POOL_SIZE)
+    with writer.connection() as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        init_db(conn)
+    reader = SQLitePool(DB_NAME, DB_READ_POOL_SIZE, readonly=True)
+    return writer, reader
+
+def db_write():
+    """Pinjam koneksi tulis: `with db_write() as conn: ...`"""
+    return get_db_pools()[0].connection()
+
+def db_read():
+    """Pinjam koneksi baca-saja untuk query dashboard/cek, tidak memblokir klaim."""
+    return get_db_pools()[1].connection()
+
+def init_db(conn):
+    """Fungsi inisialisasi DB, dipanggil sekali per proses."""
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS employees (
+            nrp TEXT PRIMARY KEY,
+            name TEXT,
+            quota INTEGER DEFAULT 168
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS claims (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nrp TEXT,
+            claim_date TEXT,
+            claim_time TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.commit()
+
+    # Index, constraint & trigger dikelola lewat migrasi berversi
+    run_migrations(conn)
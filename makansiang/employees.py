@@ -0,0 +1,149 @@
+"""Import data karyawan dari CSV (bulk, per chunk)."""
+import csv
+import hashlib
+import io
+import json
+import re
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from makansiang.cache import get_cache
+from makansiang.db import DAILY_QUOTA, db_read, db_write
+from makansiang.queries import QUOTA_EPOCH_SQL
+
+# =========================
+# IMPORT KARYAWAN (CSV BULK)
+# =========================
+IMPORT_CHUNK_ROWS = 5000
+IMPORT_MAX_REJECT_SAMPLES = 50
+NRP_PATTERN = re.compile(r"[0-9A-Za-z][0-9A-Za-z._-]{0,31}")
+
+def _normalize_employee_row(row):
+    """Validasi & normalisasi satu baris CSV. Mengembalikan (nrp, name, quota) atau alasan tolak.
+
+    quota None = kolom kosong: karyawan baru dapat DAILY_QUOTA, yang sudah ada
+    tidak diubah kuotanya (jatah yang sudah dipakai hari ini tidak kembali).
+    """
+    nrp = (row.get("nrp") or "").strip()
+    # Excel sering menyimpan NRP angka sebagai float, mis. "12345.0"
+    if re.fullmatch(r"\d+\.0+", nrp):
+        nrp = nrp.split(".")[0]
+    if not NRP_PATTERN.fullmatch(nrp):
+        return "NRP kosong/tidak valid"
+
+    name = " ".join((row.get("name") or "").split())
+    if not name:
+        return "Nama kosong"
+
+    raw_quota = (row.get("quota") or "").strip()
+    if not raw_quota:
+        quota = None
+    else:
+        try:
+            quota = int(float(raw_quota))
+        except ValueError:
+            return "Quota bukan angka"
+        if quota < 0:
+            return "Quota negatif"
+    return nrp, name, quota
+
+def _upsert_employee_chunk(conn, rows, epoch):
+    """Upsert satu chunk dalam satu transaksi. Mengembalikan (inserted, updated).
+
+    Baris yang tidak mengubah apa pun dilewati (tanpa trigger, invalidasi cache
+    maupun kenaikan data_version) dan tidak dihitung sebagai updated.
+    """
+    c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    c.execute(
+        "SELECT COUNT(*) FROM employees WHERE nrp IN (SELECT value FROM json_each(?))",
+        (json.dumps([r[0] for r in rows]),),
+    )
+    existing = c.fetchone()[0]
+    # ?3 = quota dari CSV (NULL jika kosong), ?5 = kuota default karyawan baru
+    c.executemany('''
+        INSERT INTO employees (nrp, name, quota, quota_epoch) VALUES (?1, ?2, COALESCE(?3, ?5), ?4)
+        ON CONFLICT (nrp) DO UPDATE SET
+            name = excluded.name,
+            quota = CASE WHEN ?3 IS NULL THEN employees.quota ELSE excluded.quota END,
+            quota_epoch = CASE WHEN ?3 IS NULL THEN employees.quota_epoch ELSE excluded.quota_epoch END
+        WHERE employees.name IS NOT excluded.name
+           OR (?3 IS NOT NULL AND (employees.quota IS NOT excluded.quota
+                                   OR employees.quota_epoch IS NOT excluded.quota_epoch))
+    ''', [(nrp, name, quota, epoch, DAILY_QUOTA) for nrp, name, quota in rows])
+    inserted = len(rows) - existing
+    changed = c.rowcount
+    conn.commit()
+    return inserted, changed - inserted
+
+def import_employees_csv(fileobj, filename=None):
+    """Import CSV karyawan (nrp, name, quota) secara streaming per chunk.
+
+    File yang isinya sama (hash SHA-256) tidak diproses ulang. Mengembalikan
+    dict: inserted, updated, rejected, duplicate_file, rejects (contoh baris ditolak).
+    """
+    hasher = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(1 << 16), b""):
+        hasher.update(block)
+    content_hash = hasher.hexdigest()
+
+    with db_read() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT inserted, updated, rejected FROM employee_imports WHERE content_hash = ?",
+            (content_hash,),
+        )
+        row = c.fetchone()
+    if row:
+        return {"inserted": row[0], "updated": row[1], "rejected": row[2],
+                "duplicate_file": True, "rejects": []}
+
+    report = {"inserted": 0, "updated": 0, "rejected": 0, "duplicate_file": False, "rejects": []}
+    fileobj.seek(0)
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        reader.fieldnames = [(f or "").strip().lower() for f in (reader.fieldnames or [])]
+        missing = {"nrp", "name"} - set(reader.fieldnames)
+        if missing:
+            raise ValueError(f"Kolom wajib tidak ada: {', '.join(sorted(missing))}")
+
+        with db_write() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT {QUOTA_EPOCH_SQL}", (date.today().isoformat(),))
+            epoch = c.fetchone()[0]
+
+            chunk = {}
+            for line_no, raw in enumerate(reader, start=2):
+                parsed = _normalize_employee_row(raw)
+                if isinstance(parsed, str):
+                    report["rejected"] += 1
+                    if len(report["rejects"]) < IMPORT_MAX_REJECT_SAMPLES:
+                        report["rejects"].append((line_no, raw.get("nrp"), parsed))
+                    continue
+                # NRP dobel dalam file: baris terakhir yang dipakai
+                chunk[parsed[0]] = parsed
+                if len(chunk) >= IMPORT_CHUNK_ROWS:
+                    inserted, updated = _upsert_employee_chunk(conn, list(chunk.values()), epoch)
+                    report["inserted"] += inserted
+                    report["updated"] += updated
+                    chunk = {}
+            if chunk:
+                inserted, updated = _upsert_employee_chunk(conn, list(chunk.values()), epoch)
+                report["inserted"] += inserted
+                report["updated"] += updated
+
+            conn.execute('''
+                INSERT OR REPLACE INTO employee_imports
+                    (content_hash, filename, imported_at, inserted, updated, rejected)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (content_hash, filename, datetime.now(ZoneInfo("Asia/Jakarta")).isoformat(timespec="seconds"),
+                  report["inserted"], report["updated"], report["rejected"]))
+            conn.commit()
+    finally:
+        # Jangan biarkan TextIOWrapper menutup file upload milik Streamlit
+        text.detach()
+
+    get_cache().invalidate_namespace("employee")
+    return report
@@ -0,0 +1,121 @@
+"""Export klaim ke CSV / Parquet secara streaming (pyarrow opsional)."""
+import csv
+import hashlib
+import importlib.util
+import os
+import re
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+from makansiang.archive import ARCHIVE_DB_NAME, archive_attached
+from makansiang.cache import get_data_version
+from makansiang.db import db_read
+
+# =========================
+# EXPORT KLAIM (CSV / PARQUET, STREAMING)
+# =========================
+EXPORT_DIR = Path(".exports")
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_MAX_AGE = 24 * 3600  # file export lebih tua dari ini dihapus maintenance
+EXPORT_COLUMNS = ["nrp", "name", "claim_date", "claim_time"]
+EXPORT_MIME = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def filename_part(text):
+    """Teks ketikan admin (mis. NRP) yang aman dipakai di nama file: hanya [A-Za-z0-9_-]."""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", text)[:32]
+
+def parquet_available():
+    """Parquet butuh pyarrow (opsional); CSV selalu tersedia."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+def iter_claim_rows(start, end, nrp=None):
+    """Stream (nrp, name, claim_date, claim_time) per chunk dari arsip lalu claims.
+
+    Arsip selalu berisi tanggal yang lebih lama dari tabel claims, jadi hasil
+    tetap urut tanggal tanpa ORDER BY gabungan (tidak perlu sort di memori).
+    """
+    params = (start, end, nrp) if nrp else (start, end)
+    has_archive = Path(ARCHIVE_DB_NAME).exists()
+    with db_read() as conn, (archive_attached(conn, readonly=True) if has_archive else nullcontext()):
+        c = conn.cursor()
+        queries = []
+        if has_archive:
+            queries.append(f"""
+                SELECT nrp, name, claim_date, claim_time FROM archive.claims_archive
+                WHERE claim_date >= ? AND claim_date <= ?{" AND nrp = ?" if nrp else ""}
+                ORDER BY claim_date, claim_time
+            """)
+        queries.append(f"""
+            SELECT c.nrp, e.name, c.claim_date, c.claim_time
+            FROM claims c
+            JOIN employees e ON e.nrp = c.nrp
+            WHERE c.claim_date >= ? AND c.claim_date <= ?{" AND c.nrp = ?" if nrp else ""}
+            ORDER BY c.claim_date, c.claim_time
+        """)
+        for query in queries:
+            c.execute(query, params)
+            while True:
+                rows = c.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                yield rows
+
+def _write_export_csv(path, chunks):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+
+def _write_export_parquet(path, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(col, pa.string()) for col in EXPORT_COLUMNS])
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in chunks:
+            columns = [pa.array(col, pa.string()) for col in zip(*rows)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+def export_claims(start, end, nrp=None, fmt="csv"):
+    """Buat file export klaim [start, end] (ISO), opsional per NRP. Mengembalikan Path.
+
+    File di-cache di EXPORT_DIR dengan key (range, nrp, format, data_version):
+    download ulang data yang sama tidak query ulang database.
+    """
+    if fmt not in EXPORT_MIME:
+        raise ValueError(f"Format export tidak dikenal: {fmt}")
+    version = get_data_version()
+    key = hashlib.sha1(f"{start}|{end}|{nrp or ''}|{fmt}|{version}".encode()).hexdigest()[:12]
+    suffix = f"_{filename_part(nrp)}" if nrp else ""
+    path = EXPORT_DIR / f"claims_{start}_{end}{suffix}_{key}.{fmt}"
+    if path.exists():
+        return path
+
+    EXPORT_DIR.mkdir(exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        chunks = iter_claim_rows(start, end, nrp)
+        if fmt == "parquet":
+            _write_export_parquet(tmp, chunks)
+        else:
+            _write_export_csv(tmp, chunks)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path
+
+def prune_exports(max_age=EXPORT_MAX_AGE):
+    """Hapus file export lama (dipanggil maintenance)."""
+    if not EXPORT_DIR.exists():
+        return
+    cutoff = time.time() - max_age
+    for path in EXPORT_DIR.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
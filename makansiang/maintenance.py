@@ -0,0 +1,125 @@
+"""Thread maintenance latar (retention, reset harian, checkpoint, ANALYZE/VACUUM)."""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from makansiang.analytics import backfill_rollups_from_archive
+from makansiang.archive import cleanup_old_claims
+from makansiang.cache import prune_cache_log
+from makansiang.claims import auto_reset_daily
+from makansiang.db import db_read, db_write, get_db_pools
+from makansiang.exports import prune_exports
+from makansiang.metrics import timed
+from makansiang.resources import process_resource
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# MAINTENANCE TERJADWAL (BACKGROUND)
+# =========================
+MAINTENANCE_INTERVAL = 15 * 60       # detik minimal antar putaran maintenance
+MAINTENANCE_TICK = 60                # seberapa sering thread mengecek jadwal
+MAINTENANCE_LEASE_TTL = 5 * 60       # lease dianggap mati setelah ini
+HEAVY_MAINTENANCE_INTERVAL = 24 * 3600
+MAINTENANCE_QUIET_HOURS = range(10, 14)  # jam WIB: jangan VACUUM saat jam makan siang
+
+class MaintenanceScheduler:
+    """Thread latar: retention, auto-reset, checkpoint WAL, ANALYZE/VACUUM.
+
+    Antar proses dikoordinasi lewat lease di metadata ('maintenance_lease'),
+    jadi hanya satu proses yang bekerja dan paling sering sekali per interval.
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Maintenance gagal")
+            self._stop.wait(MAINTENANCE_TICK)
+
+    def _acquire_lease(self, now):
+        # Nilai lease: "<epoch kadaluarsa>|<owner>"; CAST mengambil angka di depan,
+        # owner dibandingkan persis (bukan LIKE: '_'/'%' di hostname jadi wildcard)
+        with db_write() as conn:
+            c = conn.cursor()
+            c.execute('''
+                INSERT INTO metadata (key, value) VALUES ('maintenance_lease', ?1)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value
+                WHERE CAST(value AS INTEGER) < ?2 OR substr(value, instr(value, '|') + 1) = ?3
+            ''', (f"{int(now + MAINTENANCE_LEASE_TTL)}|{self.owner}", int(now), self.owner))
+            acquired = c.rowcount == 1
+            conn.commit()
+        return acquired
+
+    def _release_lease(self):
+        with db_write() as conn:
+            conn.execute(
+                "DELETE FROM metadata WHERE key = 'maintenance_lease' AND substr(value, instr(value, '|') + 1) = ?",
+                (self.owner,),
+            )
+            conn.commit()
+
+    def _last_run(self, key):
+        with db_read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT value FROM metadata WHERE key = ?", (key,))
+            row = c.fetchone()
+        return float(row[0]) if row else 0.0
+
+    def _mark_run(self, key, now):
+        with db_write() as conn:
+            conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (key, str(now)))
+            conn.commit()
+
+    @timed("job", "maintenance")
+    def run_once(self, force=False):
+        """Jalankan maintenance jika sudah jatuh tempo. True jika benar-benar jalan."""
+        now = time.time()
+        if not force and now - self._last_run("maintenance_last_run") < MAINTENANCE_INTERVAL:
+            return False
+        if not self._acquire_lease(now):
+            return False
+        try:
+            # Cek ulang setelah pegang lease: proses lain mungkin baru selesai
+            if not force and now - self._last_run("maintenance_last_run") < MAINTENANCE_INTERVAL:
+                return False
+
+            auto_reset_daily()
+            cleanup_old_claims()
+            backfill_rollups_from_archive()
+            prune_exports()
+            prune_cache_log(now)
+            with db_write() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+            hour = datetime.now(ZoneInfo("Asia/Jakarta")).hour
+            heavy_due = now - self._last_run("maintenance_last_heavy") >= HEAVY_MAINTENANCE_INTERVAL
+            if heavy_due and hour not in MAINTENANCE_QUIET_HOURS:
+                with db_write() as conn:
+                    conn.execute("ANALYZE")
+                    conn.commit()
+                    conn.execute("VACUUM")
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._mark_run("maintenance_last_heavy", now)
+
+            self._mark_run("maintenance_last_run", now)
+            return True
+        finally:
+            self._release_lease()
+
+@process_resource
+def get_maintenance_scheduler():
+    """Satu scheduler per proses; dimulai saat script pertama kali jalan."""
+    get_db_pools()
+    return MaintenanceScheduler()
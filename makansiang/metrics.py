@@ -0,0 +1,191 @@
+"""Instrumentasi ringan: histogram durasi, counter, dan export Prometheus.
+
+Dipakai dari core maupun UI (`timed`, `count`); mati (no-op) kecuali
+LUNCH_METRICS=1.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+from makansiang.resources import process_resource
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# METRIK & INSTRUMENTASI
+# =========================
+# Aktif hanya jika LUNCH_METRICS=1. Saat mati, timed() mengembalikan objek
+# no-op (sebagai decorator: fungsi asli dikembalikan apa adanya) dan count()
+# langsung return, jadi jalur klaim praktis tidak membayar apa pun.
+# Data disimpan di memori, per proses.
+METRICS_ENABLED = os.environ.get("LUNCH_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_PORT = int(os.environ.get("LUNCH_METRICS_PORT", "0"))  # 0 = tanpa endpoint /metrics
+METRICS_WINDOW = 1024  # sampel terakhir per metrik untuk persentil
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class RollingHistogram:
+    """Durasi (detik): jendela sampel terakhir + bucket kumulatif ala Prometheus."""
+
+    __slots__ = ("samples", "buckets", "count", "total")
+
+    def __init__(self):
+        self.samples = deque(maxlen=METRICS_WINDOW)
+        self.buckets = [0] * len(METRICS_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        i = bisect_left(METRICS_BUCKETS, seconds)
+        if i < len(self.buckets):
+            self.buckets[i] += 1
+
+class Metrics:
+    """Histogram durasi & counter, key = (jenis, nama), mis. ("db", "read")."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._counters = {}
+
+    def observe(self, kind, name, seconds):
+        with self._lock:
+            hist = self._timings.get((kind, name))
+            if hist is None:
+                hist = self._timings[(kind, name)] = RollingHistogram()
+            hist.observe(seconds)
+
+    def inc(self, kind, name, n=1):
+        with self._lock:
+            self._counters[(kind, name)] = self._counters.get((kind, name), 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+    def timing_rows(self):
+        """Ringkasan per metrik durasi (ms) dari jendela sampel terakhir."""
+        import numpy as np
+
+        with self._lock:
+            items = [(key, np.array(h.samples), h.count) for key, h in self._timings.items()]
+        rows = []
+        for (kind, name), samples, total_count in sorted(items, key=lambda item: item[0]):
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+            rows.append({
+                "jenis": kind, "nama": name, "jumlah": total_count,
+                "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": samples.max() * 1000,
+            })
+        return rows
+
+    def counter_rows(self):
+        with self._lock:
+            return [(kind, name, value) for (kind, name), value in sorted(self._counters.items())]
+
+    def prometheus_text(self):
+        """Format teks eksposisi Prometheus (histogram lunch_<jenis>_seconds, counter lunch_<jenis>_total)."""
+        with self._lock:
+            timings = sorted(
+                (key, list(h.buckets), h.count, h.total) for key, h in self._timings.items()
+            )
+            counters = sorted(self._counters.items())
+        lines, typed = [], set()
+        for (kind, name), buckets, total_count, total in timings:
+            metric = f"lunch_{kind}_seconds"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            label = _prometheus_label(name)
+            cumulative = 0
+            for le, n in zip(METRICS_BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{name="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{name="{label}",le="+Inf"}} {total_count}')
+            lines.append(f'{metric}_sum{{name="{label}"}} {total:.6f}')
+            lines.append(f'{metric}_count{{name="{label}"}} {total_count}')
+        for (kind, name), value in counters:
+            metric = f"lunch_{kind}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f'{metric}{{name="{_prometheus_label(name)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+def _prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+@process_resource
+def get_metrics():
+    """Satu Metrics per proses, dipakai bersama semua sesi dan thread latar."""
+    return Metrics()
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, fn):
+        return fn
+
+_NOOP_TIMER = _NoopTimer()
+
+@contextmanager
+def _timer(kind, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_metrics().observe(kind, name, time.perf_counter() - started)
+
+def timed(kind, name):
+    """Ukur durasi: `with timed("section", "admin"):` atau `@timed("build", "snapshot")`."""
+    if not METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _timer(kind, name)
+
+def count(kind, name, n=1):
+    if METRICS_ENABLED:
+        get_metrics().inc(kind, name, n)
+
+@process_resource
+def start_metrics_exporter():
+    """Endpoint /metrics di 127.0.0.1:LUNCH_METRICS_PORT, sekali per proses."""
+    if not (METRICS_ENABLED and METRICS_PORT):
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_metrics().prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # jangan penuhi log Streamlit dengan setiap scrape
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), MetricsHandler)
+    except OSError:
+        # Beberapa proses app di satu host: hanya yang pertama dapat port
+        logger.warning("Port metrik %s sudah dipakai, exporter tidak dijalankan", METRICS_PORT)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    return server
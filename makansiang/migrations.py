@@ -0,0 +1,362 @@
+"""Migrasi skema berversi (index, trigger, counter, rollup, log cache)."""
+import sqlite3
+
+# =========================
+# SCHEMA MIGRATIONS
+# =========================
+# Versi skema disimpan di metadata (key='schema_version'). Migrasi baru
+# selalu ditambahkan di akhir MIGRATIONS; migrasi yang sudah rilis jangan diubah.
+
+def _migration_1(c):
+    """Index klaim, UNIQUE(nrp, claim_date) dan trigger pengurangan kuota."""
+    # Buang duplikat lama (sisa race condition sebelumnya) agar UNIQUE bisa dibuat.
+    c.execute('''
+        DELETE FROM claims WHERE id NOT IN (
+            SELECT MIN(id) FROM claims GROUP BY nrp, claim_date
+        )
+    ''')
+    # Dipakai get_claim_today dan klaim atomik (ON CONFLICT)
+    c.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_claims_nrp_date
+        ON claims (nrp, claim_date)
+    ''')
+    # Dipakai history 3 hari, cleanup_old_claims dan hitungan "hari ini"
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS ix_claims_date_time
+        ON claims (claim_date, claim_time)
+    ''')
+    # Pengurangan kuota ikut dalam statement INSERT klaim yang sama
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_claims_quota
+        AFTER INSERT ON claims
+        BEGIN
+            UPDATE employees SET quota = quota - 1 WHERE nrp = NEW.nrp;
+        END
+    ''')
+
+def _migration_2(c):
+    """Foreign key claims.nrp -> employees.nrp (SQLite harus rebuild tabel)."""
+    # Klaim lama tanpa data karyawan tetap disimpan: buat baris karyawan kosong
+    c.execute('''
+        INSERT OR IGNORE INTO employees (nrp)
+        SELECT DISTINCT nrp FROM claims WHERE nrp IS NOT NULL
+    ''')
+    c.execute("DELETE FROM claims WHERE nrp IS NULL OR claim_date IS NULL")
+    c.execute('''
+        CREATE TABLE claims_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nrp TEXT NOT NULL REFERENCES employees (nrp) ON UPDATE CASCADE,
+            claim_date TEXT NOT NULL,
+            claim_time TEXT
+        )
+    ''')
+    c.execute('''
+        INSERT INTO claims_new (id, nrp, claim_date, claim_time)
+        SELECT id, nrp, claim_date, claim_time FROM claims
+    ''')
+    c.execute("DROP TABLE claims")
+    c.execute("ALTER TABLE claims_new RENAME TO claims")
+
+    # Index & trigger ikut terhapus bersama tabel lama
+    c.execute("CREATE UNIQUE INDEX ux_claims_nrp_date ON claims (nrp, claim_date)")
+    c.execute("CREATE INDEX ix_claims_date_time ON claims (claim_date, claim_time)")
+    c.execute('''
+        CREATE TRIGGER trg_claims_quota
+        AFTER INSERT ON claims
+        BEGIN
+            UPDATE employees SET quota = quota - 1 WHERE nrp = NEW.nrp;
+        END
+    ''')
+
+    c.execute("PRAGMA foreign_key_check (claims)")
+    if c.fetchone():
+        raise sqlite3.IntegrityError("Data claims melanggar foreign key setelah migrasi")
+
+def _migration_3(c):
+    """Tabel daily_counters yang di-update trigger bersama INSERT/DELETE klaim."""
+    c.execute('''
+        CREATE TABLE daily_counters (
+            claim_date TEXT PRIMARY KEY,
+            claims INTEGER NOT NULL DEFAULT 0,
+            claimants INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        INSERT INTO daily_counters (claim_date, claims, claimants)
+        SELECT claim_date, COUNT(*), COUNT(DISTINCT nrp) FROM claims GROUP BY claim_date
+    ''')
+    # UNIQUE(nrp, claim_date) menjamin setiap klaim baru = satu pengklaim baru
+    c.execute('''
+        CREATE TRIGGER trg_claims_counter_ins
+        AFTER INSERT ON claims
+        BEGIN
+            INSERT INTO daily_counters (claim_date, claims, claimants)
+            VALUES (NEW.claim_date, 1, 1)
+            ON CONFLICT (claim_date) DO UPDATE
+            SET claims = claims + 1, claimants = claimants + 1;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER trg_claims_counter_del
+        AFTER DELETE ON claims
+        BEGIN
+            UPDATE daily_counters
+            SET claims = claims - 1, claimants = claimants - 1
+            WHERE claim_date = OLD.claim_date;
+            DELETE FROM daily_counters
+            WHERE claim_date = OLD.claim_date AND claims <= 0;
+        END
+    ''')
+
+def _migration_4(c):
+    """data_version di metadata, naik setiap ada perubahan claims/employees."""
+    c.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('data_version', 0)")
+    bump = "UPDATE metadata SET value = value + 1 WHERE key = 'data_version';"
+    for table, event in (
+        ("claims", "INSERT"), ("claims", "DELETE"),
+        ("employees", "INSERT"), ("employees", "UPDATE"), ("employees", "DELETE"),
+    ):
+        c.execute(f'''
+            CREATE TRIGGER trg_{table}_version_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                {bump}
+            END
+        ''')
+
+def _migration_5(c):
+    """Kuota per epoch reset: reset cukup menulis metadata.quota_epoch."""
+    c.execute("ALTER TABLE employees ADD COLUMN quota_epoch TEXT")
+    c.execute("SELECT value FROM metadata WHERE key='last_reset'")
+    row = c.fetchone()
+    epoch = row[0] if row else ""
+    c.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES ('quota_epoch', ?)", (epoch,))
+    c.execute("DELETE FROM metadata WHERE key='last_reset'")
+    # Kuota yang tersimpan sekarang berlaku untuk epoch terakhir
+    c.execute("UPDATE employees SET quota_epoch = ?", (epoch,))
+
+    # Kuota dari epoch lama dianggap penuh (168) lalu dikurangi satu
+    c.execute("DROP TRIGGER trg_claims_quota")
+    c.execute('''
+        CREATE TRIGGER trg_claims_quota
+        AFTER INSERT ON claims
+        BEGIN
+            UPDATE employees
+            SET quota = (CASE WHEN quota_epoch = MAX(COALESCE(
+                            (SELECT value FROM metadata WHERE key = 'quota_epoch'), ''),
+                            NEW.claim_date)
+                         THEN quota ELSE 168 END) - 1,
+                quota_epoch = MAX(COALESCE(
+                            (SELECT value FROM metadata WHERE key = 'quota_epoch'), ''),
+                            NEW.claim_date)
+            WHERE nrp = NEW.nrp;
+        END
+    ''')
+
+def _migration_6(c):
+    """Riwayat import CSV karyawan, dedup berdasarkan hash isi file."""
+    c.execute('''
+        CREATE TABLE employee_imports (
+            content_hash TEXT PRIMARY KEY,
+            filename TEXT,
+            imported_at TEXT NOT NULL,
+            inserted INTEGER NOT NULL,
+            updated INTEGER NOT NULL,
+            rejected INTEGER NOT NULL
+        )
+    ''')
+
+# Agregat rollup (dipakai migrasi 7 dan backfill arsip). {source} = tabel
+# sumber klaim, {where} = filter baris. Jam & menit diambil dari "HH:MM:SS".
+ROLLUP_HOUR_SQL = "CAST(substr({col}, 1, 2) AS INTEGER)"
+ROLLUP_MINUTE_SQL = "CAST(substr({col}, 1, 2) AS INTEGER) * 60 + CAST(substr({col}, 4, 2) AS INTEGER)"
+ROLLUP_BACKFILL_SQL = (
+    '''
+    INSERT INTO rollup_daily (claim_date, claims, claimants)
+    SELECT claim_date, COUNT(*), COUNT(DISTINCT nrp) FROM {source}
+    WHERE {where} GROUP BY claim_date
+    ON CONFLICT (claim_date) DO UPDATE
+    SET claims = claims + excluded.claims, claimants = claimants + excluded.claimants
+    ''',
+    f'''
+    INSERT INTO rollup_hourly (claim_date, hour, claims)
+    SELECT claim_date, {ROLLUP_HOUR_SQL.format(col="claim_time")} AS h, COUNT(*) FROM {{source}}
+    WHERE {{where}} AND claim_time IS NOT NULL GROUP BY claim_date, h
+    ON CONFLICT (claim_date, hour) DO UPDATE SET claims = claims + excluded.claims
+    ''',
+    f'''
+    INSERT INTO rollup_minute (claim_date, minute, claims)
+    SELECT claim_date, {ROLLUP_MINUTE_SQL.format(col="claim_time")} AS m, COUNT(*) FROM {{source}}
+    WHERE {{where}} AND claim_time IS NOT NULL GROUP BY claim_date, m
+    ON CONFLICT (claim_date, minute) DO UPDATE SET claims = claims + excluded.claims
+    ''',
+    '''
+    INSERT INTO rollup_employee_monthly (month, nrp, claims)
+    SELECT substr(claim_date, 1, 7) AS mon, nrp, COUNT(*) FROM {source}
+    WHERE {where} GROUP BY mon, nrp
+    ON CONFLICT (month, nrp) DO UPDATE SET claims = claims + excluded.claims
+    ''',
+)
+
+def _migration_7(c):
+    """Tabel rollup (harian, per jam, per menit, per karyawan per bulan)."""
+    c.execute('''
+        CREATE TABLE rollup_daily (
+            claim_date TEXT PRIMARY KEY,
+            claims INTEGER NOT NULL,
+            claimants INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE rollup_hourly (
+            claim_date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            claims INTEGER NOT NULL,
+            PRIMARY KEY (claim_date, hour)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE rollup_minute (
+            claim_date TEXT NOT NULL,
+            minute INTEGER NOT NULL,  -- menit sejak 00:00
+            claims INTEGER NOT NULL,
+            PRIMARY KEY (claim_date, minute)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('''
+        CREATE TABLE rollup_employee_monthly (
+            month TEXT NOT NULL,  -- YYYY-MM
+            nrp TEXT NOT NULL,
+            claims INTEGER NOT NULL,
+            PRIMARY KEY (month, nrp)
+        ) WITHOUT ROWID
+    ''')
+    for sql in ROLLUP_BACKFILL_SQL:
+        c.execute(sql.format(source="claims", where="1"))
+
+    # Hanya AFTER INSERT: rollup adalah riwayat, tidak berkurang saat
+    # klaim lama dipindah ke arsip oleh retention.
+    c.execute(f'''
+        CREATE TRIGGER trg_claims_rollup
+        AFTER INSERT ON claims
+        BEGIN
+            INSERT INTO rollup_daily (claim_date, claims, claimants)
+            VALUES (NEW.claim_date, 1, 1)
+            ON CONFLICT (claim_date) DO UPDATE
+            SET claims = claims + 1, claimants = claimants + 1;
+
+            INSERT INTO rollup_hourly (claim_date, hour, claims)
+            SELECT NEW.claim_date, {ROLLUP_HOUR_SQL.format(col="NEW.claim_time")}, 1
+            WHERE NEW.claim_time IS NOT NULL
+            ON CONFLICT (claim_date, hour) DO UPDATE SET claims = claims + 1;
+
+            INSERT INTO rollup_minute (claim_date, minute, claims)
+            SELECT NEW.claim_date, {ROLLUP_MINUTE_SQL.format(col="NEW.claim_time")}, 1
+            WHERE NEW.claim_time IS NOT NULL
+            ON CONFLICT (claim_date, minute) DO UPDATE SET claims = claims + 1;
+
+            INSERT INTO rollup_employee_monthly (month, nrp, claims)
+            VALUES (substr(NEW.claim_date, 1, 7), NEW.nrp, 1)
+            ON CONFLICT (month, nrp) DO UPDATE SET claims = claims + 1;
+        END
+    ''')
+
+    # Klaim yang sudah diarsipkan sebelum migrasi ini di-backfill di latar
+    # belakang (ATTACH tidak boleh di dalam transaksi migrasi): arsip dengan
+    # claim_id <= id terakhir saat ini, kecuali id yang baru saja dihitung.
+    c.execute("CREATE TABLE rollup_backfill_seen (id INTEGER PRIMARY KEY)")
+    c.execute("INSERT INTO rollup_backfill_seen (id) SELECT id FROM claims")
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'claims'")
+    row = c.fetchone()
+    c.execute(
+        "INSERT OR REPLACE INTO metadata (key, value) VALUES ('rollup_archive_upto', ?)",
+        (str(row[0] if row else 0),),
+    )
+
+def _migration_8(c):
+    """Log invalidasi cache (diisi trigger) agar cache banyak proses app tetap sinkron."""
+    # nrp NULL = seluruh namespace. created dipakai maintenance untuk prune.
+    c.execute('''
+        CREATE TABLE cache_invalidations (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            nrp TEXT,
+            claim_date TEXT,
+            created INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    ''')
+    c.execute('''
+        CREATE TRIGGER trg_claims_cache_ins
+        AFTER INSERT ON claims
+        BEGIN
+            INSERT INTO cache_invalidations (namespace, nrp, claim_date)
+            VALUES ('claim_today', NEW.nrp, NEW.claim_date);
+        END
+    ''')
+    # Retention (klaim > 3 hari) tidak perlu di-log: cache hanya berisi hari ini
+    c.execute('''
+        CREATE TRIGGER trg_claims_cache_del
+        AFTER DELETE ON claims
+        WHEN OLD.claim_date >= date('now', '-1 day')
+        BEGIN
+            INSERT INTO cache_invalidations (namespace, nrp, claim_date)
+            VALUES ('claim_today', OLD.nrp, OLD.claim_date);
+        END
+    ''')
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        c.execute(f'''
+            CREATE TRIGGER trg_employees_cache_{event.lower()}
+            AFTER {event} ON employees
+            BEGIN
+                INSERT INTO cache_invalidations (namespace, nrp) VALUES ('employee', {row}.nrp);
+            END
+        ''')
+    # Reset kuota (epoch maju) mengubah kuota efektif semua karyawan
+    for event in ("INSERT", "UPDATE"):
+        c.execute(f'''
+            CREATE TRIGGER trg_quota_epoch_cache_{event.lower()}
+            AFTER {event} ON metadata
+            WHEN NEW.key = 'quota_epoch'
+            BEGIN
+                INSERT INTO cache_invalidations (namespace) VALUES ('employee');
+            END
+        ''')
+
+MIGRATIONS = [
+    (1, "index & unique (nrp, claim_date) pada claims", _migration_1),
+    (2, "foreign key claims.nrp -> employees", _migration_2),
+    (3, "counter harian klaim (daily_counters)", _migration_3),
+    (4, "data_version untuk invalidasi cache", _migration_4),
+    (5, "kuota berbasis epoch reset", _migration_5),
+    (6, "riwayat import karyawan", _migration_6),
+    (7, "rollup analitik klaim", _migration_7),
+    (8, "invalidasi cache lintas proses", _migration_8),
+]
+
+def get_schema_version(c):
+    """Versi skema saat ini (0 = database lama sebelum ada migrasi)."""
+    c.execute("SELECT value FROM metadata WHERE key='schema_version'")
+    row = c.fetchone()
+    return int(row[0]) if row else 0
+
+def run_migrations(conn):
+    """Jalankan migrasi yang belum diterapkan. Idempotent dan aman antar proses."""
+    c = conn.cursor()
+    if get_schema_version(c) >= MIGRATIONS[-1][0]:
+        return
+    for version, description, migrate in MIGRATIONS:
+        # Satu transaksi per migrasi; BEGIN IMMEDIATE membuat proses lain menunggu
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(c) >= version:
+                conn.rollback()
+                continue
+            migrate(c)
+            c.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('schema_version', ?)",
+                (str(version),),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
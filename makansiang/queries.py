@@ -0,0 +1,220 @@
+"""Query jalur panas yang diberi nama, plus profiler rencana & query lambat."""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from makansiang.db import DAILY_QUOTA, db_read
+from makansiang.metrics import METRICS_ENABLED, get_metrics
+from makansiang.resources import process_resource
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# KUOTA EFEKTIF (RESET BERBASIS EPOCH)
+# =========================
+# Kuota karyawan hanya berlaku untuk epoch tempat ia terakhir dipakai
+# (employees.quota_epoch). Epoch efektif = yang terbaru antara reset manual
+# (metadata.quota_epoch) dan tanggal hari ini, jadi pergantian hari otomatis
+# me-reset kuota tanpa UPDATE ke seluruh tabel employees.
+# ?1 = tanggal hari ini (ISO).
+QUOTA_EPOCH_SQL = "MAX(COALESCE((SELECT value FROM metadata WHERE key = 'quota_epoch'), ''), ?1)"
+EFFECTIVE_QUOTA_SQL = f"(CASE WHEN quota_epoch = {QUOTA_EPOCH_SQL} THEN quota ELSE {DAILY_QUOTA} END)"
+
+
+# =========================
+# QUERY TERDAFTAR & PROFILER
+# =========================
+# Query di jalur panas punya nama tetap dan dijalankan lewat run_query():
+# teks SQL sama persis setiap kali (dipakai ulang dari statement cache
+# sqlite3), durasi tiap panggilan masuk metrik "query", dan yang melewati
+# SLOW_QUERY_MS dicatat beserta EXPLAIN QUERY PLAN-nya. Rencana semua query
+# diperiksa sekali per proses saat start; SCAN tabel penuh di-log sebagai
+# peringatan sebelum terasa saat jam makan siang.
+SLOW_QUERY_MS = float(os.environ.get("LUNCH_SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG_SIZE = 200
+
+class NamedQuery:
+    __slots__ = ("name", "sql", "allow_scan", "expect_plan")
+
+    def __init__(self, name, sql, allow_scan=False, expect_plan=None):
+        self.name = name
+        self.sql = sql
+        # True jika SCAN memang disengaja (mis. ORDER BY rowid ... LIMIT 1)
+        self.allow_scan = allow_scan
+        # Potongan teks yang wajib ada di EXPLAIN QUERY PLAN (mis. batas index)
+        self.expect_plan = expect_plan
+
+    @property
+    def param_count(self):
+        """Jumlah parameter (?NNN terbesar, atau banyaknya ? polos)."""
+        marks = re.findall(r"\?(\d*)", self.sql)
+        numbered = [int(m) for m in marks if m]
+        return max(numbered) if numbered else len(marks)
+
+QUERIES = {}
+
+def register_query(name, sql, allow_scan=False, expect_plan=None):
+    QUERIES[name] = NamedQuery(name, sql, allow_scan, expect_plan)
+
+register_query("data_version", "SELECT value FROM metadata WHERE key = 'data_version'")
+register_query("bump_data_version", "UPDATE metadata SET value = value + 1 WHERE key = 'data_version'")
+register_query("quota_epoch", "SELECT value FROM metadata WHERE key = 'quota_epoch'")
+register_query("advance_quota_epoch", """
+    INSERT INTO metadata (key, value) VALUES ('quota_epoch', ?1)
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value
+    WHERE value < excluded.value
+""")
+# ?1 = tanggal hari ini, ?2 = NRP (kolom quota = sisa kuota efektif epoch ini)
+register_query("employee", f"SELECT nrp, name, {EFFECTIVE_QUOTA_SQL} AS quota FROM employees WHERE nrp = ?2")
+register_query("add_employee", "INSERT OR IGNORE INTO employees (nrp, name) VALUES (?1, ?2)")
+register_query("employee_exists", "SELECT 1 FROM employees WHERE nrp = ?1")
+register_query("claim_today", "SELECT * FROM claims WHERE nrp = ?1 AND claim_date = ?2")
+register_query("claim_exists", "SELECT 1 FROM claims WHERE nrp = ?1 AND claim_date = ?2")
+# INSERT bersyarat: hanya masuk jika karyawan ada dan kuota efektifnya > 0.
+# Duplikat (nrp, claim_date) ditolak oleh UNIQUE index, kuota dikurangi trigger.
+register_query("claim_insert", f"""
+    INSERT INTO claims (nrp, claim_date, claim_time)
+    SELECT nrp, ?1, ?2 FROM employees WHERE nrp = ?3 AND {EFFECTIVE_QUOTA_SQL} > 0
+    ON CONFLICT (nrp, claim_date) DO NOTHING
+""")
+register_query("daily_counter", "SELECT claims, claimants FROM daily_counters WHERE claim_date = ?1")
+# Mundur dari rowid terbesar lalu berhenti di baris pertama: SCAN disengaja
+register_query("last_claim", """
+    SELECT c.claim_time, e.name
+    FROM claims c
+    JOIN employees e ON c.nrp = e.nrp
+    ORDER BY c.id DESC
+    LIMIT 1
+""", allow_scan=True)
+register_query("log_invalidation", "INSERT INTO cache_invalidations (namespace, nrp, claim_date) VALUES (?1, ?2, ?3)")
+register_query("cache_log_head", "SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations")
+register_query("cache_log_since", "SELECT seq, namespace, nrp, claim_date FROM cache_invalidations WHERE seq > ?1 ORDER BY seq")
+register_query("cache_log_floor", "SELECT value FROM metadata WHERE key = 'cache_log_floor'")
+register_query("history_day_counts", """
+    SELECT claim_date, claims FROM daily_counters
+    WHERE claim_date >= ?1 AND claims > 0
+    ORDER BY claim_date DESC
+""")
+HISTORY_PAGE_SQL = """
+    SELECT c.id, c.nrp, e.name, c.claim_date, c.claim_time
+    FROM claims c
+    JOIN employees e ON e.nrp = c.nrp
+    WHERE c.claim_date >= ?1 AND {upper}
+    ORDER BY c.claim_date DESC, c.claim_time DESC, c.id DESC
+    LIMIT ?3
+"""
+register_query("history_page", HISTORY_PAGE_SQL.format(upper="c.claim_date <= ?2"))
+# Halaman berikutnya: cursor (?4, ?5, ?6) selalu <= ?2, jadi batas atas diganti
+# (claim_date, claim_time) <= cursor agar jadi batas index. Dengan claim_date <= ?2
+# ikut, SQLite memilih batas itu dan halaman ke-N membuang semua baris sebelumnya.
+register_query("history_page_after", HISTORY_PAGE_SQL.format(
+    upper="(c.claim_date, c.claim_time) <= (?4, ?5) AND (c.claim_date, c.claim_time, c.id) < (?4, ?5, ?6)"
+), expect_plan="(claim_date,claim_time)<")
+
+def explain_plan(conn, sql, params):
+    """Baris detail EXPLAIN QUERY PLAN dan apakah ada SCAN tabel penuh."""
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    details = [row[-1] for row in rows]
+    full_scan = any(
+        d.startswith("SCAN ") and " USING " not in d and "CONSTANT ROW" not in d
+        for d in details
+    )
+    return details, full_scan
+
+class QueryProfiler:
+    """Rencana query per nama + log query lambat (per proses)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.plans = {}
+        self.slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    def check_plans(self, conn):
+        """EXPLAIN semua query terdaftar (parameter NULL).
+
+        SCAN tak terduga dan rencana tanpa `expect_plan` query-nya di-log.
+        """
+        for query in QUERIES.values():
+            try:
+                details, full_scan = explain_plan(conn, query.sql, (None,) * query.param_count)
+            except sqlite3.Error as e:
+                details, full_scan = [f"gagal: {e}"], False
+            as_expected = query.expect_plan is None or any(query.expect_plan in d for d in details)
+            with self._lock:
+                self.plans[query.name] = (details, full_scan, as_expected)
+            if full_scan and not query.allow_scan:
+                logger.warning("Query %s melakukan SCAN tabel penuh: %s", query.name, "; ".join(details))
+            if not as_expected:
+                logger.warning("Query %s tidak memakai rencana %r: %s",
+                               query.name, query.expect_plan, "; ".join(details))
+
+    def recheck_plans(self):
+        """Periksa ulang rencana semua query (mis. setelah ANALYZE); log query lambat tetap."""
+        with db_read() as conn:
+            self.check_plans(conn)
+
+    def record_slow(self, conn, query, params, elapsed):
+        try:
+            details, full_scan = explain_plan(conn, query.sql, params)
+        except sqlite3.Error as e:
+            details, full_scan = [f"gagal: {e}"], False
+        ms = elapsed * 1000
+        logger.warning("Query lambat %s: %.1f ms, plan: %s", query.name, ms, "; ".join(details))
+        with self._lock:
+            self.slow.append({
+                "waktu": datetime.now().strftime("%H:%M:%S"),
+                "nama": query.name,
+                "ms": round(ms, 1),
+                "full_scan": full_scan,
+                "plan": "; ".join(details),
+            })
+
+    def plan_rows(self):
+        with self._lock:
+            plans = dict(self.plans)
+        return [
+            {"nama": name, "full_scan": full_scan,
+             "disengaja": QUERIES[name].allow_scan if name in QUERIES else False,
+             "sesuai_harapan": as_expected,
+             "plan": "; ".join(details)}
+            for name, (details, full_scan, as_expected) in sorted(plans.items())
+        ]
+
+    def slow_rows(self):
+        with self._lock:
+            return list(reversed(self.slow))
+
+@process_resource
+def get_query_profiler():
+    """Satu profiler per proses; rencana query diperiksa sekali saat dibuat."""
+    profiler = QueryProfiler()
+    profiler.recheck_plans()
+    return profiler
+
+def run_query(c, name, params=(), fetch=None):
+    """Jalankan query terdaftar lewat koneksi/cursor `c`.
+
+    fetch=None mengembalikan cursor (mis. untuk rowcount), "one" satu baris,
+    "all" semua baris; durasi yang dicatat sudah termasuk fetch.
+    """
+    query = QUERIES[name]
+    started = time.perf_counter()
+    cur = c.execute(query.sql, params)
+    if fetch == "one":
+        result = cur.fetchone()
+    elif fetch == "all":
+        result = cur.fetchall()
+    else:
+        result = cur
+    elapsed = time.perf_counter() - started
+    if METRICS_ENABLED:
+        get_metrics().observe("query", name, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        # Cursor pemanggil jangan ditimpa: EXPLAIN lewat koneksinya
+        get_query_profiler().record_slow(getattr(c, "connection", c), query, params, elapsed)
+    return result
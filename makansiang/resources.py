@@ -0,0 +1,32 @@
+"""Objek yang dibuat sekali per proses dan dipakai bersama semua sesi.
+
+Modul paket hanya di-import sekali per proses (tidak dijalankan ulang setiap
+rerun seperti lunch.py), jadi core tidak butuh st.cache_resource: cukup satu
+slot + lock per factory. Core tetap bisa di-import tanpa runtime Streamlit.
+"""
+import functools
+import threading
+
+_UNSET = object()
+
+def process_resource(factory):
+    """Decorator: `factory()` dijalankan sekali per proses; `.clear()` membuang hasilnya."""
+    lock = threading.Lock()
+    value = _UNSET
+
+    @functools.wraps(factory)
+    def get():
+        nonlocal value
+        if value is _UNSET:
+            with lock:
+                if value is _UNSET:
+                    value = factory()
+        return value
+
+    def clear():
+        nonlocal value
+        with lock:
+            value = _UNSET
+
+    get.clear = clear
+    return get
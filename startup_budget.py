@@ -0,0 +1,156 @@
+"""Budget waktu start: import core, cold start halaman, dan biaya rerun.
+
+Setiap pengukuran jalan di proses Python baru (belum ada modul ter-import)
+terhadap database sementara (LUNCH_DB). Hasil dibandingkan dengan BUDGET;
+exit code 1 jika ada yang lewat, jadi bisa dipakai sebelum merge:
+
+    python startup_budget.py
+    python startup_budget.py --runs 5 -o startup.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).with_name("lunch.py")
+ADMIN_PASSWORD = "admin123"
+# Modul berat yang tidak boleh ikut dimuat di halaman karyawan
+HEAVY_MODULES = ("pandas", "numpy", "plotly.express", "pyarrow")
+
+# Batas atas (median); jumlah modul baru per rerun harus 0. Baseline terukur
+# (--runs 3, median beberapa putaran): core 30-59 ms, cold start 225-377 ms,
+# rerun 50-89 ms, admin pertama 460-660 ms; budget ~1.7-2x yang terburuk.
+BUDGET = {
+    "core_import_ms": 120,
+    "cold_start_ms": 750,
+    "rerun_ms": 150,
+    "rerun_new_modules": 0,
+    "admin_first_ms": 1300,
+}
+
+
+# =========================
+# PENGUKURAN (PROSES ANAK)
+# =========================
+def measure_core():
+    """Import paket core saja (tanpa Streamlit)."""
+    started = time.perf_counter()
+    import makansiang.claims  # noqa: F401
+    import makansiang.maintenance  # noqa: F401
+    elapsed = time.perf_counter() - started
+    return {
+        "core_import_ms": elapsed * 1000,
+        "core_heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+def timed_run(at):
+    started = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return time.perf_counter() - started
+
+def measure_page(reruns):
+    """Cold start halaman karyawan, rerun biasa, lalu render admin pertama."""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_import = time.perf_counter() - started
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=60)
+    cold = timed_run(at)
+    page_heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    rerun_times, new_modules = [], set()
+    for _ in range(reruns):
+        before = set(sys.modules)
+        rerun_times.append(timed_run(at))
+        new_modules |= set(sys.modules) - before
+
+    password = next(t for t in at.text_input if t.label == "Masukkan Password Admin:")
+    password.input(ADMIN_PASSWORD)
+    admin_first = timed_run(at)
+    return {
+        "streamlit_import_ms": streamlit_import * 1000,
+        "cold_start_ms": cold * 1000,
+        "page_heavy_modules": page_heavy,
+        "rerun_ms": statistics.median(rerun_times) * 1000,
+        "rerun_new_modules": len(new_modules),
+        "rerun_new_module_names": sorted(new_modules),
+        "admin_first_ms": admin_first * 1000,
+        "admin_heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+
+# =========================
+# BUDGET
+# =========================
+def run_child(kind, env, reruns):
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", kind, "--reruns", str(reruns)],
+        cwd=APP_PATH.parent, env=env, capture_output=True, text=True, check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Pengukuran {kind} gagal:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def run_budget(args):
+    workdir = Path(tempfile.mkdtemp(prefix="lunch-startup-"))
+    env = dict(os.environ, LUNCH_DB=str(workdir / "lunch.db"))
+    env.pop("LUNCH_METRICS", None)  # ukur jalur default (instrumentasi mati)
+    try:
+        # Run pertama membuat skema; cold start yang diukur memakai DB yang sudah ada
+        run_child("page", env, 1)
+        samples = [run_child("core", env, 0) | run_child("page", env, args.reruns) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {}
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        result[key] = statistics.median(values) if isinstance(values[0], (int, float)) else values[-1]
+
+    violations = [
+        f"{key}: {result[key]:.1f} > {limit}" for key, limit in BUDGET.items() if result[key] > limit
+    ]
+    for key in ("core_heavy_modules", "page_heavy_modules"):
+        if result[key]:
+            violations.append(f"{key}: {', '.join(result[key])}")
+    result["budget"] = BUDGET
+    result["violations"] = violations
+    return result
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="jumlah proses baru per pengukuran (diambil median)")
+    parser.add_argument("--reruns", type=int, default=10, help="rerun per proses untuk biaya rerun")
+    parser.add_argument("-o", "--output", help="tulis hasil JSON ke file ini")
+    parser.add_argument("--child", choices=("core", "page"), help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        result = measure_core() if args.child == "core" else measure_page(args.reruns)
+        print(json.dumps(result))
+        return 0
+
+    result = run_budget(args)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    for key, limit in BUDGET.items():
+        print(f"{key:<20}{result[key]:>10.1f}  (budget {limit})", file=sys.stderr)
+    for violation in result["violations"]:
+        print(f"LEWAT BUDGET  {violation}", file=sys.stderr)
+    return 1 if result["violations"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())